@@ -0,0 +1,87 @@
+"""
+Benchmark: DICOM series pipeline scaling with series size.
+
+Usage:
+    python benchmark_dicom_series.py [sizes] [rows]
+
+Writes synthetic CT series (default 50,100,250,500 slices of 512x512 int16),
+runs process_dicom_series on each and prints wall time and time per instance.
+Each instance is processed exactly once, so ms/instance should stay flat as the
+series grows. The pipeline audits each series, so the audit DB, ledger and
+DICOM key are pointed at a throwaway directory before main is imported.
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pydicom
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, CTImageStorage, generate_uid
+from fastapi import BackgroundTasks
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="medvault_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'audit.db')}"
+os.environ["LEDGER_DB_PATH"] = os.path.join(SCRATCH_DIR, "ledger.db")
+os.environ["DICOM_SECRET_PATH"] = os.path.join(SCRATCH_DIR, "dicom.key")
+os.environ["PROGRESS_DB_PATH"] = os.path.join(SCRATCH_DIR, "progress.db")
+
+from main import process_dicom_series, audit_writer
+
+def make_series(directory: str, slices: int, rows: int):
+    study_uid, series_uid = generate_uid(), generate_uid()
+    pixels = np.random.randint(0, 2000, (rows, rows), dtype=np.int16).tobytes()
+    instances = []
+    for i in range(slices):
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = CTImageStorage
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+        ds = pydicom.Dataset()
+        ds.file_meta = meta
+        ds.SOPClassUID = CTImageStorage
+        ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+        ds.StudyInstanceUID, ds.SeriesInstanceUID = study_uid, series_uid
+        ds.PatientName, ds.PatientID = "Doe^John", "MRN123456"
+        ds.PatientBirthDate, ds.PatientSex = "19700101", "M"
+        ds.Modality, ds.InstanceNumber = "CT", i + 1
+        ds.Rows = ds.Columns = rows
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 12, 11, 1
+        ds.SamplesPerPixel, ds.PhotometricInterpretation = 1, "MONOCHROME2"
+        ds.PixelData = pixels
+
+        filename = f"bench_{series_uid[-8:]}_{i:04d}.dcm"
+        path = os.path.join(directory, filename)
+        ds.save_as(path, enforce_file_format=True)
+        instances.append((path, filename))
+    return instances
+
+async def main():
+    sizes = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [50, 100, 250, 500]
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+
+    directory = tempfile.mkdtemp()
+    try:
+        print(f"{rows}x{rows} slices")
+        for size in sizes:
+            instances = make_series(directory, size, rows)
+            started = time.perf_counter()
+            output = await process_dicom_series(instances, "research", "benchmark", BackgroundTasks())
+            seconds = time.perf_counter() - started
+            assert len(output["results"]) == size and len(output["series"]) == 1
+            print(f"  {size:>5} instances {seconds:8.3f}s  {1000 * seconds / size:7.2f} ms/instance")
+            for path, _ in instances:
+                os.remove(path)
+            for result in output["results"]:
+                os.remove(os.path.join(tempfile.gettempdir(), "redacted", os.path.basename(result["download_url"])))
+    finally:
+        audit_writer.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Benchmark: pdfplumber (re-drawn text) vs PyMuPDF (in-place redaction) PDF engines.
+
+Usage:
+    python benchmark_pdf_engines.py [pages] [runs]
+
+Generates a text-layer PDF with the given number of pages, runs both engines
+on it and prints the best wall time per engine and pages/second.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from main import _redact_pdf_pdfplumber, _redact_pdf_pymupdf
+
+PAGE_LINES = [
+    "Discharge Summary - Patient: John Doe, MRN123456",
+    "Admission date: 01/02/2024   Discharge date: 01/09/2024",
+    "Attending physician: Dr. Sarah Connor, Boston General Hospital",
+    "Chief complaint: fever and shortness of breath, history of asthma",
+    "Hospital course: treated with IV antibiotics, diabetes managed with insulin",
+    "Follow-up with Dr. Alan Grant in New York on 02/01/2024, call 555-123-4567",
+]
+
+def make_pdf(path: str, pages: int):
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        y = 750
+        for repeat in range(6):
+            for line in PAGE_LINES:
+                c.drawString(40, y, f"{line} (p{page + 1})")
+                y -= 16
+        c.showPage()
+    c.save()
+
+async def time_engine(engine, src: str, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        out = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
+        started = time.perf_counter()
+        sink = await engine(src, out, "research")
+        best = min(best, time.perf_counter() - started)
+        os.remove(out)
+        os.remove(sink.text_file.name)
+    return best
+
+async def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    src = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
+    make_pdf(src, pages)
+    try:
+        print(f"{pages} pages, best of {runs} runs")
+        for name, engine in [("pdfplumber", _redact_pdf_pdfplumber), ("pymupdf", _redact_pdf_pymupdf)]:
+            seconds = await time_engine(engine, src, runs)
+            print(f"  {name:<10} {seconds:8.3f}s  {pages / seconds:8.1f} pages/s")
+    finally:
+        os.remove(src)
+
+if __name__ == "__main__":
+    asyncio.run(main())
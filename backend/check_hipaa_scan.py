@@ -0,0 +1,90 @@
+"""
+Regression check: HipaaScanner vs the original per-pattern re.search check.
+
+Usage:
+    python check_hipaa_scan.py [random_docs]
+
+Runs scan_hipaa over hand-picked overlapping cases plus randomly assembled
+documents, and fails if the reported categories (and, for whole documents,
+per-category counts) differ from scanning each HIPAA_IDENTIFIERS pattern on
+its own. Also checks that hipaa_spans (image/PDF masking) covers every
+specific identifier, inside broad matches and past HIPAA_MAX_HITS.
+"""
+import random
+import re
+import sys
+
+from main import HIPAA_IDENTIFIERS, HipaaScanner, scan_hipaa, hipaa_spans, HIPAA_MAX_HITS
+
+CASES = [
+    "Bed 4 MRN12345 John Smith HP998 seen at 45 Elm Street",
+    "Bed 4 MRN12345 seen at 45 Elm Street",
+    "Contact HP123@clinic.org or https://portal.example.com/MRN42 today",
+    "SSN 123-45-6789, phone 555-123-4567, seen 01/02/2024 from 10.0.0.1",
+    "Jane Doe lives at 12 Oak Avenue and 7 Pine Rd, device DEVX12 VIN1HGCM82",
+    "Dates and numbers sharing digits: 01/02/123-456-7890 1.2.3.123-45-6789 1/2/12.3.4.5",
+    "",
+]
+
+FRAGMENTS = [
+    "John Smith", "Mary Jones", "MRN123456", "HP4431", "AC99812", "CERT77", "LIC4410",
+    "VIN1HGCM82633A", "DEVA12", "UID9981", "123-45-6789", "555-867-5309", "01/02/2024",
+    "jane.doe@example.com", "https://ehr.example.org/p/MRN7", "192.168.1.20", "FINGERPRINT",
+    "PHOTO", "221 Baker Street", "45 Elm St", "9 Sunset Blvd", "bed", "seen at", "and", "4",
+    "follow-up", "history of asthma", "\n",
+]
+
+def reference(text: str):
+    """The original check: every identifier searched on its own."""
+    violations = [key for key, pattern in HIPAA_IDENTIFIERS.items() if re.search(pattern, text)]
+    counts = {key: n for key, pattern in HIPAA_IDENTIFIERS.items() if (n := len(re.findall(pattern, text)))}
+    return violations, counts
+
+def chunked(text: str, rng: random.Random):
+    scanner = HipaaScanner()
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, 600)
+        scanner.feed(text[pos:pos + step])
+        pos += step
+    return scanner.result()
+
+def check(text: str, rng: random.Random) -> int:
+    violations, counts = reference(text)
+    failures = 0
+    # Chunked counts can differ when a greedy address match is longer than
+    # HIPAA_SCAN_OVERLAP, so chunked feeds are held to the categories only
+    for label, result, expected_counts in [
+        ("whole", scan_hipaa(text), counts),
+        ("chunked", chunked(text, rng), None)
+    ]:
+        if result["violations"] != violations or expected_counts not in (None, result["counts"]):
+            failures += 1
+            print(f"MISMATCH ({label}): {text[:120]!r}")
+            print(f"  expected {violations} {counts}")
+            print(f"  got      {result['violations']} {result['counts']}")
+    return failures
+
+def main():
+    docs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = random.Random(0)
+    failures = sum(check(text, rng) for text in CASES)
+    for _ in range(docs):
+        text = " ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(5, 400)))
+        failures += check(text, rng)
+
+    # Redaction spans must cover specific IDs even inside a broad match, past the hit cap too
+    spans = hipaa_spans("Bed 4 MRN12345 seen at 45 Elm Street")
+    if not any(label == "medical_record_number" for _, _, label in spans):
+        failures += 1
+        print(f"MISMATCH (hipaa_spans): MRN not covered, got {spans}")
+    many = " ".join(f"MRN{i}" for i in range(2 * HIPAA_MAX_HITS))
+    if len(hipaa_spans(many)) != 2 * HIPAA_MAX_HITS:
+        failures += 1
+        print(f"MISMATCH (hipaa_spans): capped at {len(hipaa_spans(many))} spans")
+
+    print(f"{len(CASES) + docs} documents, {failures} mismatches")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
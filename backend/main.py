@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, File, Path, Query, BackgroundTasks, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Path, Query, BackgroundTasks, Form, HTTPException, Header
 from typing import List, Dict, Tuple
 import io
 import cv2
@@ -11,22 +11,40 @@ import spacy
 from docx import Document
 import pandas as pd
 import json
+import csv
 from pdf2image import convert_from_path
 import tempfile
 import os
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 import re
 import httpx
 from pydantic import BaseModel
 import hashlib
-from datetime import datetime, timezone
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+import hmac
+import secrets
+import sqlite3
+from datetime import datetime, timedelta, timezone
+import sqlalchemy.event
+from sqlalchemy import create_engine, func, tuple_, Column, Index, Integer, String, DateTime
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
 from twilio.rest import Client
 from dotenv import load_dotenv
 import asyncio
-from collections import Counter
+import functools
+import queue
+import threading
+from collections import Counter, OrderedDict, deque
+import shutil
+import heapq
+from abc import ABC, abstractmethod
+import math
+import struct
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
 import fitz
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
@@ -45,11 +63,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Storing progress for batch proccessing 
-progress_store = {}
-
-# Load NLP model for PII detection
-nlp = spacy.load("en_core_web_md")
+# Load NLP model for PII detection. Only doc.ents is ever read, so the
+# tagging/parsing components are not loaded at all.
+NLP_EXCLUDE = ["tagger", "parser", "senter", "attribute_ruler", "lemmatizer"]
+nlp = spacy.load("en_core_web_md", exclude=NLP_EXCLUDE)
 
 # Create EntityRuler
 ruler = nlp.add_pipe("entity_ruler", before="ner")
@@ -88,6 +105,27 @@ MODE_ENTITY_MAP = {
     "legal": LEGAL_ENTITIES            # redact PII + legal IDs
 }
 
+# Pipeline profile per mode → components that can be switched off
+def _build_pipeline_profile(labels) -> List[str]:
+    needed = set()
+    if labels & set(ruler.labels):
+        needed.add("entity_ruler")
+    if labels & set(nlp.get_pipe("ner").labels):
+        # The ruler must still run ahead of ner: tokens it claims (e.g. "high court")
+        # are skipped by ner, so dropping it would change ner's output
+        needed.update({"ner", "entity_ruler"})
+        for name, pipe in nlp.pipeline:
+            if "ner" in getattr(pipe, "listening_components", []):
+                needed.add(name)
+    # Modes whose labels only come from the ruler patterns get a ruler-only pipeline
+    return [name for name in nlp.pipe_names if name not in needed]
+
+MODE_PIPELINE_DISABLE = {mode: _build_pipeline_profile(labels) for mode, labels in MODE_ENTITY_MAP.items()}
+
+def pipeline_disable(mode: str) -> List[str]:
+    # Unknown modes redact nothing, so they do not need any component
+    return MODE_PIPELINE_DISABLE.get(mode, nlp.pipe_names)
+
 # Load environment variables and twirlio credentials
 load_dotenv()
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
@@ -107,8 +145,20 @@ class Action(BaseModel):
     user: str
 
 #  Database  Setup
-DATABASE_URL = "sqlite:///./medvault_audit.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./medvault_audit.db")
+_AUDIT_DB_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if _AUDIT_DB_SQLITE else {})
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run while the audit writer commits; NORMAL only fsyncs at checkpoints
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+if _AUDIT_DB_SQLITE:
+    sqlalchemy.event.listen(engine, "connect", _sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -121,7 +171,167 @@ class AuditLog(Base):
     timestamp = Column(DateTime, default=datetime.now(timezone.utc))
     fingerprint = Column(String)
 
+    # Every query pages by (timestamp, id), optionally narrowed to one document or user
+    __table_args__ = (
+        Index("ix_audit_logs_doc_id_timestamp", "doc_id", "timestamp"),
+        Index("ix_audit_logs_user_timestamp", "user", "timestamp"),
+        Index("ix_audit_logs_timestamp", "timestamp"),
+    )
+
 Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist, so add indexes missing from older databases
+for _index in AuditLog.__table__.indexes:
+    _index.create(bind=engine, checkfirst=True)
+
+# ---------- Audit Log Writer ----------
+AUDIT_FLUSH_BATCH = int(os.getenv("AUDIT_FLUSH_BATCH", "256"))            # rows per transaction
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.05"))  # seconds a row may wait
+AUDIT_RETRY_SECONDS = float(os.getenv("AUDIT_RETRY_SECONDS", "1"))
+AUDIT_MAX_RETRIES = int(os.getenv("AUDIT_MAX_RETRIES", "5"))
+# Rows the database keeps rejecting are appended here (NDJSON) instead of blocking the queue
+AUDIT_DEAD_LETTER_PATH = os.getenv("AUDIT_DEAD_LETTER_PATH", "./medvault_audit_deadletter.ndjson")
+
+class AuditWriter:
+    """Group-commits audit rows from a background thread.
+
+    Callers enqueue and return at once; the thread drains the queue into one
+    transaction per batch, flushing when AUDIT_FLUSH_BATCH rows are waiting or
+    the oldest row has waited AUDIT_FLUSH_INTERVAL seconds. A batch that still
+    fails after AUDIT_MAX_RETRIES is written row by row, and rows that fail on
+    their own go to the dead-letter file, so one bad row cannot hold up the rest.
+    """
+
+    def __init__(self, batch_size: int, interval: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.last_error = None
+        self.max_batch = 0
+        self.flush_ms = deque(maxlen=256)     # transaction time per flush
+        self.latency_ms = deque(maxlen=256)   # enqueue → committed, oldest row per flush
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, row: Dict):
+        self._start()
+        self._queue.put((time.perf_counter(), row))
+
+    def _collect(self) -> List[Tuple[float, Dict]]:
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return batch
+        deadline = batch[0][0] + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is None:
+                break
+        return batch
+
+    def _write(self, rows: List[Dict]):
+        db = SessionLocal()
+        try:
+            db.execute(AuditLog.__table__.insert(), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    def _dead_letter(self, rows: List[Dict], error: str):
+        with open(AUDIT_DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({"row": row, "error": error}, default=str) + "\n")
+        self.dead_lettered += len(rows)
+
+    def _write_rows(self, items: List[Tuple[float, Dict]]):
+        """Fallback for a batch that keeps failing: each row commits (or is dead-lettered) on its own."""
+        for _, row in items:
+            try:
+                self._write([row])
+                self.written += 1
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = str(exc)
+                self._dead_letter([row], str(exc))
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is None
+            items = [item for item in batch if item is not None]
+            for attempt in range(AUDIT_MAX_RETRIES + 1) if items else ():
+                started = time.perf_counter()
+                try:
+                    self._write([row for _, row in items])
+                except Exception as exc:
+                    self.failures += 1
+                    self.last_error = str(exc)
+                    if attempt == AUDIT_MAX_RETRIES:
+                        self._write_rows(items)
+                    else:
+                        time.sleep(AUDIT_RETRY_SECONDS)
+                    continue
+                finished = time.perf_counter()
+                self.flush_ms.append(1000 * (finished - started))
+                self.latency_ms.append(1000 * (finished - items[0][0]))
+                self.written += len(items)
+                self.flushes += 1
+                self.max_batch = max(self.max_batch, len(items))
+                break
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Blocks until every queued row is committed."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stats(self) -> Dict:
+        def summary(samples):
+            ordered = sorted(samples)
+            if not ordered:
+                return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+            return {
+                "avg": round(sum(ordered) / len(ordered), 3),
+                "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+                "max": round(ordered[-1], 3)
+            }
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batch_size": self.batch_size,
+            "interval_ms": 1000 * self.interval,
+            "written": self.written,
+            "flushes": self.flushes,
+            "avg_batch": round(self.written / self.flushes, 2) if self.flushes else 0.0,
+            "max_batch": self.max_batch,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered,
+            "last_error": self.last_error,
+            "flush_ms": summary(self.flush_ms),
+            "commit_latency_ms": summary(self.latency_ms)
+        }
+
+    def shutdown(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+audit_writer = AuditWriter(AUDIT_FLUSH_BATCH, AUDIT_FLUSH_INTERVAL)
 
 # Blockchain Setup
 
@@ -135,17 +345,512 @@ class Block:
     def compute_hash(self):
         return hashlib.sha256(f"{self.index}{self.timestamp}{self.data}{self.previous_hash}".encode()).hexdigest()
 
-blockchain = []
 def create_genesis_block():
     return Block(0, datetime.now(timezone.utc).isoformat(), "Genesis Block", "0")
-if not blockchain:
-    blockchain.append(create_genesis_block())
+
+# ---------- Persistent Ledger ----------
+LEDGER_DB_PATH = os.getenv("LEDGER_DB_PATH", "./medvault_ledger.db")
+LEDGER_CHECKPOINT_INTERVAL = int(os.getenv("LEDGER_CHECKPOINT_INTERVAL", "1024"))  # blocks per Merkle checkpoint
+LEDGER_PAGE_SIZE = int(os.getenv("LEDGER_PAGE_SIZE", "500"))
+LEDGER_MAX_PAGE_SIZE = int(os.getenv("LEDGER_MAX_PAGE_SIZE", "5000"))
+LEDGER_MODE = os.getenv("LEDGER_MODE", "block")   # block: one block per event, batched: one Merkle root per window
+LEDGER_BATCH_WINDOW = float(os.getenv("LEDGER_BATCH_WINDOW", "0.1"))   # seconds events wait for their batch
+LEDGER_BATCH_MAX_EVENTS = int(os.getenv("LEDGER_BATCH_MAX_EVENTS", "4096"))
+
+def _merkle_leaf(value: str) -> bytes:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(value)).digest()
+
+def _merkle_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+def _merkle_levels(leaves: List[str]) -> List[List[bytes]]:
+    """Every level of the tree, leaves first; an odd node out is promoted unchanged."""
+    level = [_merkle_leaf(leaf) for leaf in leaves]
+    levels = [level]
+    while len(level) > 1:
+        level = [
+            _merkle_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        levels.append(level)
+    return levels
+
+def merkle_root(leaves: List[str]) -> str:
+    return _merkle_levels(leaves)[-1][0].hex()
+
+def merkle_proof(leaves: List[str], position: int) -> List[Dict]:
+    """Sibling hashes from the leaf up to the root, each tagged with the side it sits on."""
+    proof = []
+    for level in _merkle_levels(leaves)[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({"hash": level[sibling].hex(), "side": "left" if sibling < position else "right"})
+        position //= 2
+    return proof
+
+def verify_merkle_proof(leaf: str, proof: List[Dict], root: str) -> bool:
+    node = _merkle_leaf(leaf)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = _merkle_node(sibling, node) if step["side"] == "left" else _merkle_node(node, sibling)
+    return node.hex() == root
+
+def _serialized(method):
+    """
+    Runs a Ledger method under the ledger's lock. The holder may be waiting on
+    BEGIN IMMEDIATE or rehashing the chain, so async callers go through asyncio.to_thread.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class Ledger:
+    """
+    Append-only hash chain in SQLite, shared by every uvicorn worker on the host.
+
+    Appends take the database write lock (BEGIN IMMEDIATE), so index and
+    previous_hash are assigned by exactly one writer at a time across processes.
+    Every LEDGER_CHECKPOINT_INTERVAL blocks the range is sealed under a Merkle
+    root, so a single block can be proven without walking the chain. verify()
+    resumes from the stored verified-up-to block and only rehashes what was
+    appended since. The connection is shared by the event loop and the threads
+    appends run in (see add_block_async), so every public method holds _lock.
+    """
+    def __init__(self, path: str, checkpoint_interval: int):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per process: uvicorn workers fork after import
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                "idx INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, data TEXT NOT NULL, "
+                "previous_hash TEXT NOT NULL, hash TEXT NOT NULL)"
+            )
+            columns = {name for _, name, *_ in conn.execute("PRAGMA table_info(blocks)")}
+            if "doc_id" not in columns:
+                # Filter columns copied out of the block data; ledgers created before they existed are backfilled
+                conn.execute("ALTER TABLE blocks ADD COLUMN doc_id TEXT")
+                conn.execute("ALTER TABLE blocks ADD COLUMN user TEXT")
+                conn.execute(
+                    "UPDATE blocks SET doc_id = json_extract(data, '$.doc_id'), user = json_extract(data, '$.user') "
+                    "WHERE json_valid(data) AND json_type(data) = 'object'"
+                )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_blocks_doc_id ON blocks (doc_id, idx)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_blocks_user ON blocks (user, idx)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_blocks_timestamp ON blocks (timestamp, idx)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "start_idx INTEGER PRIMARY KEY, end_idx INTEGER NOT NULL, root TEXT NOT NULL, created TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ledger_events ("
+                "event_hash TEXT PRIMARY KEY, block_idx INTEGER NOT NULL, position INTEGER NOT NULL, "
+                "timestamp TEXT NOT NULL, data TEXT NOT NULL, doc_id TEXT, user TEXT, nonce TEXT)"
+            )
+            if "nonce" not in {name for _, name, *_ in conn.execute("PRAGMA table_info(ledger_events)")}:
+                conn.execute("ALTER TABLE ledger_events ADD COLUMN nonce TEXT")   # rows without one hash as before
+            conn.execute("DROP INDEX IF EXISTS ix_ledger_events_doc_id")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ledger_events_block ON ledger_events (block_idx, position)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ledger_events_doc ON ledger_events (doc_id, block_idx, position)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ledger_events_user ON ledger_events (user, block_idx, position)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ledger_events_timestamp ON ledger_events (timestamp)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ledger_state ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), verified_idx INTEGER NOT NULL, verified_hash TEXT NOT NULL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+            self._write(lambda: None)   # creates the genesis block on first use
+        return self._conn
+
+    _COLUMNS = "idx, timestamp, data, previous_hash, hash"
+
+    @staticmethod
+    def _block(row) -> Block:
+        idx, timestamp, data, previous_hash, stored_hash = row
+        block = Block(idx, timestamp, json.loads(data), previous_hash)
+        block.hash = stored_hash    # keep what was stored so verify() can compare
+        return block
+
+    def _insert(self, block: Block):
+        fields = block.data if isinstance(block.data, dict) else {}
+        self._conn.execute(
+            f"INSERT INTO blocks ({self._COLUMNS}, doc_id, user) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (block.index, block.timestamp, json.dumps(block.data), block.previous_hash, block.hash,
+             fields.get("doc_id"), fields.get("user"))
+        )
+
+    def _write(self, fn):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            tip = self._conn.execute("SELECT idx, hash FROM blocks ORDER BY idx DESC LIMIT 1").fetchone()
+            if tip is None:
+                genesis = create_genesis_block()
+                self._insert(genesis)
+                self._conn.execute("INSERT INTO ledger_state VALUES (1, 0, ?)", (genesis.hash,))
+            result = fn()
+            self._conn.execute("COMMIT")
+            return result
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _append(self, data) -> Block:
+        # Runs inside _write, which holds the write lock
+        index, previous_hash = self._conn.execute("SELECT idx, hash FROM blocks ORDER BY idx DESC LIMIT 1").fetchone()
+        block = Block(index + 1, datetime.now(timezone.utc).isoformat(), data, previous_hash)
+        self._insert(block)
+        if (block.index + 1) % self.checkpoint_interval == 0:
+            self._seal(block.index + 1 - self.checkpoint_interval, block.index)
+        return block
+
+    @_serialized
+    def append(self, data) -> Block:
+        self._connect()
+        # Hash exactly what will be read back, so stored blocks rehash identically
+        data = json.loads(json.dumps(data, default=str))
+        return self._write(lambda: self._append(data))
+
+    @_serialized
+    def append_batch(self, events: List["LedgerEvent"]) -> Block:
+        """One block holding the Merkle root of the events; the events are kept for proofs."""
+        self._connect()
+        data = {"action": "merkle_batch", "merkle_root": merkle_root([e.hash for e in events]), "events": len(events)}
+
+        def write():
+            block = self._append(data)
+            self._conn.executemany(
+                "INSERT INTO ledger_events (event_hash, block_idx, position, timestamp, data, doc_id, user, nonce) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (e.hash, block.index, position, e.timestamp, json.dumps(e.data), e.doc_id, e.user, e.nonce)
+                    for position, e in enumerate(events)
+                ]
+            )
+            return block
+        return self._write(write)
+
+    def _batch_root(self, block_idx: int):
+        """Recomputes a batch block's Merkle root from its stored events (None if an event was altered)."""
+        hashes = []
+        for event_hash, timestamp, data, nonce in self._conn.execute(
+            "SELECT event_hash, timestamp, data, nonce FROM ledger_events WHERE block_idx = ? ORDER BY position", (block_idx,)
+        ):
+            if LedgerEvent.compute_hash(timestamp, json.loads(data), nonce) != event_hash:
+                return None
+            hashes.append(event_hash)
+        return merkle_root(hashes) if hashes else None
+
+    def _seal(self, start: int, end: int):
+        hashes = [h for (h,) in self._conn.execute(
+            "SELECT hash FROM blocks WHERE idx BETWEEN ? AND ? ORDER BY idx", (start, end)
+        )]
+        self._conn.execute(
+            "INSERT OR IGNORE INTO checkpoints VALUES (?, ?, ?, ?)",
+            (start, end, merkle_root(hashes), datetime.now(timezone.utc).isoformat())
+        )
+
+    @_serialized
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+
+    @_serialized
+    def entries(self, after: Tuple[int, int] = (-1, -1), limit: int = LEDGER_PAGE_SIZE, doc_id: str = None,
+                user: str = None, since: str = None, until: str = None) -> List[Dict]:
+        """
+        One keyset page of blocks and batched events, optionally filtered, ordered by
+        (block index, position in the batch), where a block itself sorts at position -1.
+        Each side is an index range scan; the two pages are merged here.
+        """
+        conn = self._connect()
+        filters = [(clause, value) for clause, value in [
+            ("doc_id = ?", doc_id), ("user = ?", user), ("timestamp >= ?", since), ("timestamp < ?", until)
+        ] if value is not None]
+        where = "".join(f" AND {clause}" for clause, _ in filters)
+        params = [value for _, value in filters]
+
+        blocks = [
+            dict(self._block(row).__dict__, type="block")
+            for row in conn.execute(
+                f"SELECT {self._COLUMNS} FROM blocks WHERE idx > ?{where} ORDER BY idx LIMIT ?",
+                (after[0], *params, limit)
+            )
+        ]
+        events = [
+            {"type": "event", "index": block_idx, "position": position, "timestamp": timestamp,
+             "data": json.loads(data), "hash": event_hash, "nonce": nonce}
+            for event_hash, block_idx, position, timestamp, data, nonce in conn.execute(
+                "SELECT event_hash, block_idx, position, timestamp, data, nonce FROM ledger_events "
+                f"WHERE (block_idx, position) > (?, ?){where} ORDER BY block_idx, position LIMIT ?",
+                (*after, *params, limit)
+            )
+        ]
+        return list(heapq.merge(blocks, events, key=ledger_entry_key))[:limit]
+
+    @_serialized
+    def get(self, index: int):
+        row = self._connect().execute(f"SELECT {self._COLUMNS} FROM blocks WHERE idx = ?", (index,)).fetchone()
+        return self._block(row) if row else None
+
+    @_serialized
+    def verify(self, full: bool = False) -> Dict:
+        """Rehashes blocks after the verified-up-to checkpoint (or all of them when full)."""
+        conn = self._connect()
+        verified_idx, verified_hash = conn.execute("SELECT verified_idx, verified_hash FROM ledger_state").fetchone()
+        if full:
+            verified_idx, verified_hash = -1, "0"
+        else:
+            anchor = self.get(verified_idx)
+            if anchor is None or anchor.hash != verified_hash:
+                return {"valid": False, "error": f"Verified block {verified_idx} was altered"}
+
+        # Snapshot the range in one read transaction so concurrent appends don't race the walk
+        conn.execute("BEGIN")
+        try:
+            expected_idx, previous_hash, checked = verified_idx + 1, verified_hash, 0
+            for row in conn.execute(f"SELECT {self._COLUMNS} FROM blocks WHERE idx > ? ORDER BY idx", (verified_idx,)):
+                block = self._block(row)
+                if block.index != expected_idx:
+                    return {"valid": False, "error": f"Missing block {expected_idx}"}
+                if block.hash != block.compute_hash():
+                    return {"valid": False, "error": f"Invalid hash at block {block.index}"}
+                if block.previous_hash != previous_hash:
+                    return {"valid": False, "error": f"Broken chain link at block {block.index}"}
+                if isinstance(block.data, dict) and block.data.get("action") == "merkle_batch":
+                    if self._batch_root(block.index) != block.data["merkle_root"]:
+                        return {"valid": False, "error": f"Batched events altered at block {block.index}"}
+                expected_idx, previous_hash, checked = block.index + 1, block.hash, checked + 1
+
+            checkpoints = conn.execute(
+                "SELECT start_idx, end_idx, root FROM checkpoints WHERE end_idx > ? ORDER BY start_idx", (verified_idx,)
+            ).fetchall()
+            for start, end, root in checkpoints:
+                hashes = [h for (h,) in conn.execute(
+                    "SELECT hash FROM blocks WHERE idx BETWEEN ? AND ? ORDER BY idx", (start, end)
+                )]
+                if merkle_root(hashes) != root:
+                    return {"valid": False, "error": f"Checkpoint {start}-{end} root mismatch"}
+        finally:
+            conn.execute("COMMIT")
+
+        if checked:
+            with conn:
+                conn.execute(
+                    "UPDATE ledger_state SET verified_idx = ?, verified_hash = ? WHERE verified_idx < ?",
+                    (expected_idx - 1, previous_hash, expected_idx - 1)
+                )
+        return {"valid": True, "checked": checked, "verified_upto": expected_idx - 1}
+
+    @_serialized
+    def proof(self, index: int):
+        """Merkle inclusion proof for one block against the checkpoint that sealed it."""
+        conn = self._connect()
+        block = self.get(index)
+        if block is None:
+            return None
+        checkpoint = conn.execute(
+            "SELECT start_idx, end_idx, root, created FROM checkpoints WHERE start_idx <= ? AND end_idx >= ?",
+            (index, index)
+        ).fetchone()
+        if checkpoint is None:
+            sealed_at = (index // self.checkpoint_interval + 1) * self.checkpoint_interval - 1
+            return {"block": block.__dict__, "checkpoint": None, "proof": [], "sealed_at": sealed_at}
+        start, end, root, created = checkpoint
+        hashes = [h for (h,) in conn.execute(
+            "SELECT hash FROM blocks WHERE idx BETWEEN ? AND ? ORDER BY idx", (start, end)
+        )]
+        proof = merkle_proof(hashes, index - start)
+        return {
+            "block": block.__dict__,
+            "checkpoint": {"start": start, "end": end, "root": root, "created": created},
+            "proof": proof,
+            "valid": block.hash == block.compute_hash() and verify_merkle_proof(block.hash, proof, root)
+        }
+
+    @_serialized
+    def event_proof(self, event_hash: str):
+        """Inclusion proof for one batched event against the Merkle root in its block."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT block_idx, position, timestamp, data, nonce FROM ledger_events WHERE event_hash = ?", (event_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        block_idx, position, timestamp, data, nonce = row
+        block = self.get(block_idx)
+        hashes = [h for (h,) in conn.execute(
+            "SELECT event_hash FROM ledger_events WHERE block_idx = ? ORDER BY position", (block_idx,)
+        )]
+        proof = merkle_proof(hashes, position)
+        data = json.loads(data)
+        return {
+            "event": {"hash": event_hash, "timestamp": timestamp, "data": data, "nonce": nonce, "position": position},
+            "block": block.__dict__,
+            "proof": proof,
+            "valid": (
+                LedgerEvent.compute_hash(timestamp, data, nonce) == event_hash
+                and block.hash == block.compute_hash()
+                and verify_merkle_proof(event_hash, proof, block.data["merkle_root"])
+            )
+        }
+
+    @_serialized
+    def stats(self) -> Dict:
+        conn = self._connect()
+        verified_idx, _ = conn.execute("SELECT verified_idx, verified_hash FROM ledger_state").fetchone()
+        return {
+            "blocks": len(self),
+            "verified_upto": verified_idx,
+            "checkpoints": conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0],
+            "checkpoint_interval": self.checkpoint_interval,
+            "batched_events": conn.execute("SELECT COUNT(*) FROM ledger_events").fetchone()[0]
+        }
+
+def ledger_entry_key(entry: Dict) -> Tuple[int, int]:
+    return entry["index"], entry.get("position", -1)
+
+blockchain = Ledger(LEDGER_DB_PATH, LEDGER_CHECKPOINT_INTERVAL)
+
+class LedgerEvent:
+    """
+    An audit event waiting for (or anchored by) a Merkle batch block; hash identifies it
+    in proofs. The random nonce keeps identical events logged in the same instant distinct.
+    """
+    def __init__(self, data):
+        self.timestamp = datetime.now(timezone.utc).isoformat()
+        self.data = json.loads(json.dumps(data, default=str))
+        fields = self.data if isinstance(self.data, dict) else {}
+        self.doc_id, self.user = fields.get("doc_id"), fields.get("user")
+        self.nonce = secrets.token_hex(8)
+        self.hash = self.compute_hash(self.timestamp, self.data, self.nonce)
+        self.index = None   # block that anchors the event, once its batch is flushed
+
+    @staticmethod
+    def compute_hash(timestamp: str, data, nonce: str = None) -> str:
+        payload = {"timestamp": timestamp, "data": data}
+        if nonce is not None:
+            payload["nonce"] = nonce
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def receipt(self) -> Dict:
+        return {
+            "event_hash": self.hash,
+            "status": "pending" if self.index is None else "anchored",
+            "block_index": self.index,
+            "proof_url": f"/blockchain/events/{self.hash}/proof"
+        }
+
+class LedgerBatcher:
+    """
+    Collects events on the event loop and anchors each window as a single block, so
+    the chain grows by one block per LEDGER_BATCH_WINDOW however many events arrive.
+    Callers get their event hash immediately; the inclusion proof is available once
+    the batch is flushed. Batches are written in a worker thread.
+    """
+    def __init__(self, ledger: Ledger, window: float, max_events: int):
+        self.ledger = ledger
+        self.window = window
+        self.max_events = max_events
+        self.pending: List[LedgerEvent] = []
+        self.inflight: List[LedgerEvent] = []
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.events = 0
+        self.max_batch = 0
+        self.failures = 0
+        self.last_error = None
+        self.flush_ms = deque(maxlen=256)
+
+    def submit(self, data) -> LedgerEvent:
+        event = LedgerEvent(data)
+        self.pending.append(event)
+        if len(self.pending) >= self.max_events:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+        return event
+
+    def find(self, event_hash: str):
+        return next((event for event in self.pending + self.inflight if event.hash == event_hash), None)
+
+    def _take(self) -> List[LedgerEvent]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        events, self.pending = self.pending, []
+        return events
+
+    def _anchored(self, events: List[LedgerEvent], block: Block, started: float):
+        for event in events:
+            event.index = block.index
+        self.flush_ms.append(1000 * (time.perf_counter() - started))
+        self.batches += 1
+        self.events += len(events)
+        self.max_batch = max(self.max_batch, len(events))
+
+    def _start_flush(self):
+        task = asyncio.get_running_loop().create_task(self._flush())
+        self._tasks.add(task)   # keep a reference until done, or it may be GC'd mid-run
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self):
+        events = self._take()
+        if not events:
+            return
+        started = time.perf_counter()
+        self.inflight.extend(events)
+        try:
+            block = await asyncio.to_thread(self.ledger.append_batch, events)
+        except Exception as exc:
+            # Keep the events and try again next window
+            self.failures += 1
+            self.last_error = str(exc)
+            self.pending = events + self.pending
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+            return
+        finally:
+            self.inflight = [event for event in self.inflight if event not in events]
+        self._anchored(events, block, started)
+
+    def flush(self):
+        """Anchors whatever is pending right now, synchronously (shutdown)."""
+        events = self._take()
+        if events:
+            started = time.perf_counter()
+            self._anchored(events, self.ledger.append_batch(events), started)
+
+    def stats(self) -> Dict:
+        return {
+            "mode": LEDGER_MODE,
+            "window_ms": 1000 * self.window,
+            "pending": len(self.pending) + len(self.inflight),
+            "batches": self.batches,
+            "events": self.events,
+            "avg_batch": round(self.events / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "avg_flush_ms": round(sum(self.flush_ms) / len(self.flush_ms), 3) if self.flush_ms else 0.0
+        }
+
+ledger_batcher = LedgerBatcher(blockchain, LEDGER_BATCH_WINDOW, LEDGER_BATCH_MAX_EVENTS)
 
 async def add_block_async(data):
-    prev_block = blockchain[-1]
-    new_block = Block(len(blockchain), datetime.now(timezone.utc).isoformat(), data, prev_block.hash)
-    blockchain.append(new_block)
-    return new_block
+    if LEDGER_MODE == "batched":
+        return ledger_batcher.submit(data)
+    # BEGIN IMMEDIATE may wait on another worker's write lock; keep that off the event loop
+    return await asyncio.to_thread(blockchain.append, data)
 
 # HIPAA Compliance (18 identifiers)
 HIPAA_IDENTIFIERS = {
@@ -169,25 +874,352 @@ HIPAA_IDENTIFIERS = {
     "any_other_unique_id": r"\bUID\d+\b"
 }
 
+HIPAA_BROAD_IDENTIFIERS = ["address", "names"]
+# These can contain other identifiers (an MRN inside an address or URL) or start where
+# one does (HP123@clinic.org), so each keeps its own pass. No two of the remaining
+# fixed-format identifiers can match at the same position, which lets them share one.
+HIPAA_OVERLAPPING_IDENTIFIERS = ["names", "address", "email", "web_urls"]
+HIPAA_PATTERNS = {key: re.compile(pattern) for key, pattern in HIPAA_IDENTIFIERS.items()}
+HIPAA_SCAN_OVERLAP = 256    # chars held back between chunks so matches can span them
+HIPAA_MAX_HITS = 1000       # hit positions kept per scan (counts are always exact)
+
+@functools.lru_cache(maxsize=None)
+def _hipaa_single_pass(keys: Tuple[str, ...]):
+    """
+    One pattern for many fixed-format identifiers. Each starts at a word boundary on a
+    digit or capital letter, so the leading gate lets the engine skip all other positions. The
+    alternation sits in a lookahead, so a match does not consume text and an identifier
+    that shares digits with the previous one (01/02/123-456-7890) is still found.
+    """
+    alternation = "|".join(f"(?P<{key}>{HIPAA_IDENTIFIERS[key]})" for key in keys)
+    return re.compile(rf"(?<!\w)(?=[\dA-Z])(?={alternation})")
+
+class HipaaScanner:
+    """
+    Incremental HIPAA identifier scanner. Text can be fed in chunks (OCR pages,
+    CSV rows); hit offsets are relative to the concatenated stream. Fixed-format
+    identifiers share one pass and the overlapping ones get a pass each. Every
+    category still reports what a per-pattern re.finditer would, and resumes where
+    it stopped so nothing is counted twice across chunks.
+    """
+    def __init__(self, categories: List[str] = None, max_hits: int = HIPAA_MAX_HITS):
+        self.patterns = {key: HIPAA_PATTERNS[key] for key in (categories or HIPAA_PATTERNS)}
+        fixed = tuple(key for key in self.patterns if key not in HIPAA_OVERLAPPING_IDENTIFIERS)
+        self.passes = [(_hipaa_single_pass(fixed), fixed)] if fixed else []
+        self.passes += [(self.patterns[key], (key,)) for key in self.patterns if key not in fixed]
+        self.max_hits = max_hits
+        self.buffer = ""
+        self.offset = 0
+        self.resume = dict.fromkeys(self.patterns, 0)   # absolute offset each category continues from
+        self.counts = Counter()
+        self.hits = []
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        self._scan(final=False)
+
+    def _scan(self, final: bool):
+        limit = len(self.buffer) if final else len(self.buffer) - HIPAA_SCAN_OVERLAP
+        if limit <= 0:
+            return
+
+        pending = None
+        for pattern, keys in self.passes:
+            blocked = set()
+            for m in pattern.finditer(self.buffer, max(0, min(self.resume[key] for key in keys) - self.offset)):
+                key = m.lastgroup if len(keys) > 1 else keys[0]
+                start, end = m.span(key) if len(keys) > 1 else m.span()
+                if start >= limit:
+                    pending = start if pending is None else min(pending, start)
+                    break
+                if key in blocked or self.offset + start < self.resume[key]:
+                    continue    # inside this category's previous match, finditer would not report it
+                if end > limit:
+                    # Might still grow with the next chunk → rescan it then
+                    pending = start if pending is None else min(pending, start)
+                    blocked.add(key)
+                    if len(blocked) == len(keys):
+                        break
+                    continue
+                self.counts[key] += 1
+                if self.max_hits is None or len(self.hits) < self.max_hits:
+                    self.hits.append({"category": key, "offset": self.offset + start, "length": end - start})
+                self.resume[key] = self.offset + end
+
+        if final:
+            self.offset += len(self.buffer)
+            self.buffer = ""
+            return
+
+        # Keep the unscanned tail from the last whitespace (kept, so \b anchors stay correct)
+        cut = limit if pending is None else pending
+        ws = max(self.buffer.rfind(" ", 0, cut), self.buffer.rfind("\n", 0, cut))
+        keep_from = ws if ws >= 0 else (0 if pending is not None else cut)
+        self.offset += keep_from
+        self.buffer = self.buffer[keep_from:]
+
+    def result(self) -> Dict:
+        self._scan(final=True)
+        return {
+            "violations": [key for key in self.patterns if self.counts[key]],
+            "counts": dict(self.counts),
+            "hits": sorted(self.hits, key=lambda hit: hit["offset"]),
+            "truncated": sum(self.counts.values()) > len(self.hits)
+        }
+
+def scan_hipaa(text) -> Dict:
+    """Scans a string, or an iterable of string chunks, for HIPAA identifiers."""
+    scanner = HipaaScanner()
+    for chunk in ([text] if isinstance(text, str) else text):
+        scanner.feed(chunk)
+    return scanner.result()
+
 def check_hipaa_compliance(text: str) -> List[str]:
-    found = []
-    for key, pattern in HIPAA_IDENTIFIERS.items():
-        if re.search(pattern, text):
-            found.append(key)
-    return found
+    return scan_hipaa(text)["violations"]
 
 # ---------- Utility: Redact Text ----------
+# nlp.pipe settings for batched redaction (pages, cells, JSON leaves)
+REDACT_BATCH_SIZE = int(os.getenv("REDACT_BATCH_SIZE", "64"))
+REDACT_N_PROCESS = int(os.getenv("REDACT_N_PROCESS", "1"))
+REDACT_COALESCE_WINDOW = float(os.getenv("REDACT_COALESCE_WINDOW", "0.005"))   # seconds other documents may join a run
+
+def merge_spans(spans: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+    """Sorts (start, end, label) intervals and merges overlapping or touching ones."""
+    merged = []
+    for start, end, label in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            prev_start, prev_end, prev_label = merged[-1]
+            merged[-1] = (prev_start, max(prev_end, end), prev_label)
+        else:
+            merged.append((start, end, label))
+    return merged
+
+def apply_spans(text: str, spans: List[Tuple[int, int, str]], replacement: str = "[REDACTED]") -> Tuple[str, List[Tuple[int, int, str]]]:
+    """
+    Builds the redacted text in a single pass over the merged spans.
+    Returns the text plus a span table of (offset, length, label) tuples,
+    with offsets pointing into the original text.
+    """
+    parts = []
+    table = []
+    pos = 0
+    for start, end, label in merge_spans(spans):
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        table.append((start, end - start, label))
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts), table
+
+def entity_spans(doc, entities_to_redact) -> List[Tuple[int, int, str]]:
+    return [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents if ent.label_ in entities_to_redact]
+
+def redact_text_with_spans(text: str, mode: str = "research") -> Tuple[str, List[Tuple[int, int, str]]]:
+    doc = nlp(text, disable=pipeline_disable(mode))
+    entities_to_redact = MODE_ENTITY_MAP.get(mode, set())
+    return apply_spans(text, entity_spans(doc, entities_to_redact))
+
 def redact_text(text: str, mode: str = "research") -> str:
-    doc = nlp(text)
+    return redact_text_with_spans(text, mode=mode)[0]
+
+def redact_texts_with_spans(texts: List[str], mode: str = "research", batch_size: int = None, n_process: int = None) -> List[Tuple[str, List]]:
+    """
+    Redacts many strings with a single nlp.pipe pass instead of one nlp() call each.
+    Duplicate and blank strings are only sent through the pipeline once / not at all.
+    Output order matches input order; each item is (redacted_text, span_table).
+    """
     entities_to_redact = MODE_ENTITY_MAP.get(mode, set())
+    unique = list(dict.fromkeys(t for t in texts if t and t.strip()))
+
+    docs = nlp.pipe(
+        unique,
+        batch_size=batch_size or REDACT_BATCH_SIZE,
+        n_process=n_process or REDACT_N_PROCESS,
+        disable=pipeline_disable(mode)
+    )
+    redacted = {text: apply_spans(text, entity_spans(doc, entities_to_redact)) for text, doc in zip(unique, docs)}
+    return [redacted.get(t, (t, [])) for t in texts]
+
+def redact_texts(texts: List[str], mode: str = "research", batch_size: int = None, n_process: int = None) -> List[str]:
+    return [r[0] for r in redact_texts_with_spans(texts, mode=mode, batch_size=batch_size, n_process=n_process)]
+
+class RedactionBatcher:
+    """
+    Coalesces redaction requests from documents processed at the same time (the
+    files of one /upload batch, concurrent requests) into shared nlp.pipe runs.
+    Requests queue per privacy mode; one run is in flight at a time, in a worker
+    thread, and whatever queues meanwhile goes into the next run.
+    """
+    def __init__(self, window: float):
+        self.window = window
+        self._pending = {}      # mode → [(texts, future)]
+        self._worker = None
+        self.runs = 0
+        self.requests = 0
+        self.texts = 0
+
+    async def redact(self, texts: List[str], mode: str = "research") -> List[Tuple[str, List]]:
+        """Same result as redact_texts_with_spans(texts, mode)."""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(mode, []).append((texts, future))
+        self.requests += 1
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        while self._pending:
+            await asyncio.sleep(self.window)
+            mode = next(iter(self._pending))
+            requests = self._pending.pop(mode)
+            texts = [text for batch, _ in requests for text in batch]
+            try:
+                results = await asyncio.to_thread(redact_texts_with_spans, texts, mode)
+            except Exception as exc:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.runs += 1
+            self.texts += len(texts)
+            position = 0
+            for batch, future in requests:
+                if not future.done():
+                    future.set_result(results[position:position + len(batch)])
+                position += len(batch)
+
+    def stats(self) -> Dict:
+        return {
+            "runs": self.runs,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_requests_per_run": round(self.requests / self.runs, 2) if self.runs else 0.0
+        }
+
+redaction_batcher = RedactionBatcher(REDACT_COALESCE_WINDOW)
+
+def layout_words(words: List[Tuple]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Joins OCR / PDF words (text, box, line_key) into page text, one line per
+    line_key, and returns the text with each word's (start, end) offsets.
+    """
+    parts = []
+    offsets = []
+    pos = 0
+    prev_line = None
+    for text, _, line_key in words:
+        if parts:
+            sep = " " if line_key == prev_line else "\n"
+            parts.append(sep)
+            pos += len(sep)
+        offsets.append((pos, pos + len(text)))
+        parts.append(text)
+        pos += len(text)
+        prev_line = line_key
+    return "".join(parts), offsets
+
+def words_in_spans(offsets: List[Tuple[int, int]], spans: List[Tuple[int, int, str]]) -> List[int]:
+    """Indices of the words that overlap any (offset, length, label) span."""
+    if not offsets or not spans:
+        return []
+    merged = merge_spans([(off, off + length, label) for off, length, label in spans])
+    span_starts = np.array([s for s, _, _ in merged])
+    span_ends = np.array([e for _, e, _ in merged])
+    word_starts, word_ends = np.array(offsets).T
+
+    # Merged spans are disjoint and sorted, so only the last span starting before
+    # a word's end can overlap it
+    idx = np.searchsorted(span_starts, word_ends, side="left") - 1
+    hit = (idx >= 0) & (span_ends[np.maximum(idx, 0)] > word_starts)
+    return np.nonzero(hit)[0].tolist()
+
+def box_mask(shape: Tuple[int, int], boxes: List[Tuple[int, int, int, int]]) -> np.ndarray:
+    """Union of (x0, y0, x1, y1) boxes as a boolean mask, via a 2-D difference array."""
+    h, w = shape
+    b = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    x0, x1 = np.clip(b[:, 0], 0, w), np.clip(b[:, 2], 0, w)
+    y0, y1 = np.clip(b[:, 1], 0, h), np.clip(b[:, 3], 0, h)
+    diff = np.zeros((h + 1, w + 1), dtype=np.int32)
+    np.add.at(diff, (y0, x0), 1)
+    np.add.at(diff, (y0, x1), -1)
+    np.add.at(diff, (y1, x0), -1)
+    np.add.at(diff, (y1, x1), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:h, :w] > 0
+
+def hipaa_spans(text: str) -> List[Tuple[int, int, str]]:
+    """
+    HIPAA identifier hits as (start, end, category) spans. The broad free-text
+    patterns (names, addresses) are left to the mode-aware NER spans. Uncapped,
+    unlike the reporting scan: every hit has to be masked.
+    """
+    scanner = HipaaScanner([key for key in HIPAA_IDENTIFIERS if key not in HIPAA_BROAD_IDENTIFIERS], max_hits=None)
+    scanner.feed(text)
+    return [
+        (hit["offset"], hit["offset"] + hit["length"], hit["category"])
+        for hit in scanner.result()["hits"]
+    ]
+
+async def redact_word_pages(pages: List[List[Tuple]], mode: str = "research") -> List[Dict]:
+    """
+    Aligns OCR words (text, box, line_key) with the span table of their page: NER for
+    the mode, batched over all pages, plus HIPAA identifiers. Per page returns the text,
+    redacted text, span table and the indices of the words that must be masked.
+    """
+    laid_out = [layout_words(words) for words in pages]
+    ner = await redaction_batcher.redact([text for text, _ in laid_out], mode=mode)
+    results = []
+    for (text, offsets), (_, table) in zip(laid_out, ner):
+        spans = [(off, off + length, label) for off, length, label in table] + hipaa_spans(text)
+        redacted, table = apply_spans(text, spans)
+        results.append({"text": text, "redacted": redacted, "spans": table, "words": words_in_spans(offsets, table)})
+    return results
+
+class RedactionBatch:
+    """
+    Gathers text units from one or more documents, keyed by their source location
+    (page number, JSON path, ...), and redacts them together in one nlp.pipe run.
+    """
+    def __init__(self, mode: str = "research"):
+        self.mode = mode
+        self.keys = []
+        self.texts = []
+        self.spans = {}
+
+    def add(self, key, text: str):
+        self.keys.append(key)
+        self.texts.append(text)
+
+    def add_json(self, data, path: Tuple = ()):
+        # Register every string leaf of a JSON document under its key path
+        if isinstance(data, dict):
+            for k, v in data.items():
+                self.add_json(v, path + (k,))
+        elif isinstance(data, list):
+            for i, v in enumerate(data):
+                self.add_json(v, path + (i,))
+        elif isinstance(data, str):
+            self.add(path, data)
+
+    async def run(self) -> Dict:
+        # Returns {key: redacted_text}; span tables are kept in self.spans by key
+        results = await redaction_batcher.redact(self.texts, mode=self.mode)
+        self.spans = {key: spans for key, (_, spans) in zip(self.keys, results)}
+        return {key: text for key, (text, _) in zip(self.keys, results)}
+
+def rebuild_json(data, redacted: Dict, path: Tuple = ()):
+    """Rebuilds a JSON document, swapping string leaves for their redacted version."""
+    if isinstance(data, dict):
+        return {k: rebuild_json(v, redacted, path + (k,)) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [rebuild_json(v, redacted, path + (i,)) for i, v in enumerate(data)]
+    elif isinstance(data, str):
+        return redacted.get(path, data)
+    else:
+        return data
 
-    redacted = text
-    for ent in doc.ents:
-        if ent.label_ in entities_to_redact:
-            # Use regex to avoid partial replacements messing up
-            redacted = redacted.replace(ent.text, "[REDACTED]")
-    
-    return redacted
 # ---------- OCR Function ----------
 def extract_text(file_path: str):
     ext = file_path.split(".")[-1].lower()
@@ -204,40 +1236,617 @@ def extract_text(file_path: str):
 
     return text
 
+# ---------- OCR Page Cache ----------
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "1") == "1"
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join(tempfile.gettempdir(), "medvault_cache", "ocr_pages.db"))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "50000"))
+OCR_CONFIG = os.getenv("OCR_CONFIG", "")   # extra tesseract flags, part of the cache key
+
+class OcrPageCache:
+    """
+    OCR results keyed by the SHA-256 of the rendered pixels plus engine version and
+    config, so boilerplate pages (fax covers, consent forms, letterhead) are OCR'd once.
+    Lives in SQLite so every OCR worker process shares it; hit/miss counters are kept
+    in the same database for the same reason. Least recently used rows are evicted
+    once max_entries is exceeded.
+    """
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._pid = None
+        self._engine = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per process: workers are forked/spawned from the app process
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_pages ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_pages_last_used ON ocr_pages (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS ocr_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO ocr_stats VALUES ('hits', 0), ('misses', 0)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def engine_id(self) -> str:
+        if self._engine is None:
+            try:
+                version = str(pytesseract.get_tesseract_version())
+            except Exception:
+                version = "unknown"
+            self._engine = f"tesseract-{version}|{OCR_CONFIG}"
+        return self._engine
+
+    def key(self, image, kind: str) -> str:
+        # Hash the pixels themselves, not the upload, so the same page inside
+        # different files (or rendered by different endpoints) maps to one entry
+        pixels = np.ascontiguousarray(image)
+        h = hashlib.sha256(f"{self.engine_id()}|{kind}|{pixels.shape}|{pixels.dtype}".encode())
+        h.update(memoryview(pixels).cast("B"))
+        return h.hexdigest()
+
+    def get(self, key: str):
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM ocr_pages WHERE key = ?", (key,)).fetchone()
+        with conn:
+            conn.execute("UPDATE ocr_stats SET value = value + 1 WHERE name = ?", ("hits" if row else "misses",))
+            if row:
+                conn.execute("UPDATE ocr_pages SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO ocr_pages VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+            excess = conn.execute("SELECT COUNT(*) FROM ocr_pages").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM ocr_pages WHERE key IN "
+                    "(SELECT key FROM ocr_pages ORDER BY last_used LIMIT ?)", (excess,)
+                )
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM ocr_stats").fetchall())
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": OCR_CACHE_ENABLED,
+            "entries": conn.execute("SELECT COUNT(*) FROM ocr_pages").fetchone()[0],
+            "max_entries": self.max_entries,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None
+        }
+
+ocr_page_cache = OcrPageCache(OCR_CACHE_PATH, OCR_CACHE_MAX_ENTRIES)
+
+def cached_ocr(image, kind: str = "string"):
+    """pytesseract image_to_string ("string") or image_to_data ("data") through the page cache."""
+    run = {
+        "string": lambda: pytesseract.image_to_string(image, config=OCR_CONFIG),
+        "data": lambda: pytesseract.image_to_data(image, config=OCR_CONFIG, output_type=pytesseract.Output.DICT),
+    }[kind]
+    if not OCR_CACHE_ENABLED:
+        return run()
+    key = ocr_page_cache.key(image, kind)
+    value = ocr_page_cache.get(key)
+    if value is None:
+        value = run()
+        ocr_page_cache.put(key, value)
+    return value
+
+# ---------- OCR Executor ----------
+# pytesseract is CPU bound and synchronous, so it runs in a bounded process pool
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", str(os.cpu_count() or 2)))
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", str(OCR_MAX_WORKERS * 8)))
+# Forking a process that already runs threads (audit writer, to_thread workers) can deadlock
+OCR_START_METHOD = os.getenv(
+    "OCR_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+def _ocr_image_to_string(image) -> str:
+    return cached_ocr(image, "string")
+
+def _ocr_image_to_data(image) -> Dict:
+    return cached_ocr(image, "data")
+
+def _ocr_pdf_page(path: str, page_number: int, resolution: int) -> str:
+    # Render inside the worker too, rasterizing at 300 DPI is not cheap either
+    with pdfplumber.open(path, pages=[page_number + 1]) as pdf:
+        image = pdf.pages[0].to_image(resolution=resolution).original
+    return cached_ocr(image, "string")
+
+def _ocr_data_words(data: Dict, scale: float = 1.0) -> List[Tuple]:
+    """Turns an image_to_data dict into (text, (x0, y0, x1, y1), line_key) words."""
+    words = []
+    for i, word in enumerate(data["text"]):
+        if word.strip():
+            x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
+            line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            words.append((word, (x * scale, y * scale, (x + w) * scale, (y + h) * scale), line_key))
+    return words
+
+def _ocr_pdf_page_words(path: str, page_number: int, resolution: int) -> List[Tuple]:
+    # PyMuPDF engine: word boxes come back in PDF points so they can be redacted in place
+    with fitz.open(path) as doc:
+        pix = doc[page_number].get_pixmap(dpi=resolution)
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    data = cached_ocr(image, "data")
+    return _ocr_data_words(data, scale=72 / resolution)
+
+class OcrExecutor:
+    """
+    Runs OCR calls in a ProcessPoolExecutor awaited through run_in_executor.
+    At most max_queue calls are queued or running in the pool; further calls
+    from an admitted document wait for a slot, and new documents get a 429
+    while the pool is saturated instead of piling up behind it.
+    Workers start through OCR_START_METHOD; the forkserver imports this
+    module once and forks workers from that clean, single-threaded process.
+    """
+    def __init__(self, max_workers: int, max_queue: int, start_method: str = OCR_START_METHOD):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.start_method = start_method
+        self.pending = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_queue)
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            context = multiprocessing.get_context(self.start_method)
+            if self.start_method == "forkserver":
+                context.set_forkserver_preload([__name__])
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._pool
+
+    def admit(self):
+        if self.pending + self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="OCR workers are saturated, retry later")
+
+    async def run(self, fn, *args):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next call
+            self._pool = None
+            raise
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._slots.release()
+
+    async def submit(self, fn, *args):
+        self.admit()
+        return await self.run(fn, *args)
+
+    async def map(self, fn, arg_list: List[Tuple]) -> List:
+        # One admission per document; pages beyond max_queue wait for a slot
+        self.admit()
+        return await asyncio.gather(*(self.run(fn, *args) for args in arg_list))
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+ocr_executor = OcrExecutor(OCR_MAX_WORKERS, OCR_MAX_QUEUE)
+
+# ---------- Streaming PDF Pages ----------
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PDF_PAGE_WINDOW = int(os.getenv("PDF_PAGE_WINDOW", "16"))   # pages OCR'd at once
+
+async def spool_upload(file: UploadFile, suffix: str = "") -> Tuple[str, str]:
+    """Copies an upload to a temp file in fixed-size chunks; returns (path, sha256 hex)."""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            tmp.write(chunk)
+    return tmp.name, digest.hexdigest()
+
+# Per-page routing: text layer when it is good enough, OCR otherwise
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "25"))
+PDF_OCR_MIN_DPI = 150
+PDF_OCR_MAX_DPI = 300
+PDF_OCR_BASE_DPI = int(os.getenv("PDF_OCR_BASE_DPI", "200"))     # for a letter-size page
+LETTER_AREA_IN2 = 8.5 * 11
+
+def _text_layer_usable(text: str) -> bool:
+    stripped = "".join(text.split())
+    if len(stripped) < PDF_MIN_TEXT_CHARS:
+        return False
+    # Unmapped glyphs come out as "(cid:NN)" and make the layer useless
+    garbage = 5 * text.count("(cid:")
+    return garbage < 0.2 * len(stripped)
+
+def _adaptive_ocr_resolution(width: float, height: float, text: str, font_sizes: List[float] = ()) -> int:
+    """
+    Keeps the rendered pixel count of a letter page at PDF_OCR_BASE_DPI: bigger pages
+    render at a lower DPI, smaller ones higher. Dense or small print (seen in a
+    partial text layer) gets the full resolution. width/height are in points.
+    """
+    area = max((width / 72) * (height / 72), 1.0)
+    dpi = PDF_OCR_BASE_DPI * math.sqrt(LETTER_AREA_IN2 / area)
+
+    sizes = sorted(font_sizes)
+    density = len(text) / area
+    if (sizes and sizes[len(sizes) // 2] < 9) or density > 40:
+        dpi = PDF_OCR_MAX_DPI
+    return int(min(max(dpi, PDF_OCR_MIN_DPI), PDF_OCR_MAX_DPI))
+
+async def _ocr_timed(fn, path: str, page_number: int, resolution: int) -> Tuple:
+    started = time.perf_counter()
+    result = await ocr_executor.run(fn, path, page_number, resolution)
+    return result, time.perf_counter() - started
+
+def _in_flight(pending: deque) -> int:
+    return sum(1 for _, item, _ in pending if isinstance(item, asyncio.Future) and not item.done())
+
+async def _resolve_page(entry: Tuple) -> Tuple:
+    i, item, route = entry
+    if isinstance(item, asyncio.Future):
+        item, seconds = await item
+        route["seconds"] = round(seconds, 4)
+    return i, item, route
+
+async def iter_pdf_pages(path: str):
+    """
+    Yields (page_index, text, route) in page order from a single pdfplumber pass.
+    Each page uses its text layer when usable and is OCR'd otherwise, with up to
+    PDF_PAGE_WINDOW OCR pages in flight. route records the path taken and its time.
+    """
+    pending = deque()
+    admitted = False
+    try:
+        with pdfplumber.open(path) as pdf:
+            for i, page in enumerate(pdf.pages):
+                started = time.perf_counter()
+                text = page.extract_text() or ""
+
+                if _text_layer_usable(text) or (not page.images and not text.strip()):
+                    # Good text layer, or a blank page with nothing to OCR
+                    source = "text_layer" if text.strip() else "empty"
+                    route = {"page": i + 1, "source": source, "dpi": None, "seconds": round(time.perf_counter() - started, 4)}
+                    pending.append((i, text, route))
+                else:
+                    if not admitted:
+                        ocr_executor.admit()
+                        admitted = True
+                    dpi = _adaptive_ocr_resolution(page.width, page.height, text, [ch.get("size", 0) for ch in page.chars[:500]])
+                    task = asyncio.ensure_future(_ocr_timed(_ocr_pdf_page, path, i, dpi))
+                    pending.append((i, task, {"page": i + 1, "source": "ocr", "dpi": dpi, "seconds": None}))
+                page.close()  # drop the page's cached layout objects
+
+                # Emit pages in order; wait on the oldest one once the OCR window is full
+                while pending and (not isinstance(pending[0][1], asyncio.Future) or pending[0][1].done() or _in_flight(pending) >= PDF_PAGE_WINDOW):
+                    yield await _resolve_page(pending.popleft())
+
+        while pending:
+            yield await _resolve_page(pending.popleft())
+    finally:
+        for _, item, _ in pending:
+            if isinstance(item, asyncio.Future):
+                item.cancel()
+
+# ---------- PDF Redaction Engines ----------
+PDF_ENGINES = ("pdfplumber", "pymupdf")
+PDF_ENGINE = os.getenv("PDF_ENGINE", "pdfplumber")
+
+class PdfPageSink:
+    """Accumulates previews, HIPAA findings and classifier counts as pages stream through."""
+    def __init__(self):
+        self.scanner = HipaaScanner()
+        self.counts = None
+        self.original_previews = []
+        self.redacted_previews = []
+        self.routes = []
+        self.spans = []
+        # Full extracted text goes to disk (for the result cache), not memory
+        self.text_file = tempfile.NamedTemporaryFile("w", delete=False, suffix=".txt", encoding="utf-8")
+
+    def add(self, page_text: str, redacted: str, spans: List[Tuple[int, int, str]], route: Dict):
+        self.text_file.write(page_text + "\n")
+        self.spans.append(spans)
+        self.scanner.feed(page_text + "\n")
+        page_counts = classifier.count(page_text)
+        self.counts = page_counts if self.counts is None else self.counts + page_counts
+        self.original_previews.append(page_text[:500])      # first 500 chars per page
+        self.redacted_previews.append(redacted[:500])       # redacted preview per page
+        self.routes.append(route)
+
+    def close(self, discard: bool = False):
+        """Finishes the text file; discard=True removes it (failed runs)."""
+        self.text_file.close()
+        if discard and os.path.exists(self.text_file.name):
+            os.remove(self.text_file.name)
+
+    def classification(self) -> Dict:
+        if not any(p.strip() for p in self.original_previews):
+            return classify_document("")
+        return classifier.classify_counts(self.counts)[0]
+
+def _append_pdf(output_path: str, chunk_path: str):
+    """Appends the pages of chunk_path to output_path with an incremental save, then removes the chunk."""
+    with fitz.open(output_path) as out, fitz.open(chunk_path) as chunk:
+        out.insert_pdf(chunk)
+        out.saveIncr()
+    os.remove(chunk_path)
+
+async def _redact_pdf_pdfplumber(path: str, output_path: str, privacy_mode: str) -> PdfPageSink:
+    """
+    Text extraction with pdfplumber; redacted text is re-drawn with ReportLab. A Canvas
+    keeps its pages until save(), so each batch of pages gets its own canvas, saved to
+    disk and appended to the output, and memory stays flat however long the PDF is.
+    """
+    sink = PdfPageSink()
+    written = False
+
+    def write_pages(pages: List[Tuple[str, Dict]], redacted_pages: List[Tuple[str, List]]):
+        nonlocal written
+        chunk_path = output_path if not written else f"{output_path}.part"
+        c = canvas.Canvas(chunk_path, pagesize=letter)
+        for (page_text, route), (redacted, spans) in zip(pages, redacted_pages):
+            sink.add(page_text, redacted, spans, route)
+            text_object = c.beginText(40, 750)  # margins
+            for line in redacted.split("\n"):
+                text_object.textLine(line)
+            c.drawText(text_object)
+            c.showPage()  # new page for next
+        c.save()
+        if written:
+            _append_pdf(output_path, chunk_path)
+        written = True
+
+    try:
+        batch = []
+        async for _, page_text, route in iter_pdf_pages(path):
+            batch.append((page_text, route))
+            if len(batch) >= REDACT_BATCH_SIZE:
+                write_pages(batch, await redaction_batcher.redact([text for text, _ in batch], mode=privacy_mode))
+                batch = []
+        if batch or not written:
+            write_pages(batch, await redaction_batcher.redact([text for text, _ in batch], mode=privacy_mode))
+    except BaseException:
+        sink.close(discard=True)
+        for partial in (output_path, f"{output_path}.part"):
+            if os.path.exists(partial):
+                os.remove(partial)
+        raise
+    sink.close()
+    return sink
+
+async def iter_pdf_words(doc, path: str):
+    """
+    PyMuPDF counterpart of iter_pdf_pages: yields (page_index, words, route) where
+    words carry their bounding boxes in PDF points.
+    """
+    pending = deque()
+    admitted = False
+    try:
+        for i, page in enumerate(doc):
+            started = time.perf_counter()
+            words = [(w[4], tuple(w[:4]), (w[5], w[6])) for w in page.get_text("words", sort=True)]
+            text, _ = layout_words(words)
+
+            if _text_layer_usable(text) or (not page.get_images() and not text.strip()):
+                source = "text_layer" if text.strip() else "empty"
+                route = {"page": i + 1, "source": source, "dpi": None, "seconds": round(time.perf_counter() - started, 4)}
+                pending.append((i, words, route))
+            else:
+                if not admitted:
+                    ocr_executor.admit()
+                    admitted = True
+                dpi = _adaptive_ocr_resolution(page.rect.width, page.rect.height, text)
+                task = asyncio.ensure_future(_ocr_timed(_ocr_pdf_page_words, path, i, dpi))
+                pending.append((i, task, {"page": i + 1, "source": "ocr", "dpi": dpi, "seconds": None}))
+
+            while pending and (not isinstance(pending[0][1], asyncio.Future) or pending[0][1].done() or _in_flight(pending) >= PDF_PAGE_WINDOW):
+                yield await _resolve_page(pending.popleft())
+
+        while pending:
+            yield await _resolve_page(pending.popleft())
+    finally:
+        for _, item, _ in pending:
+            if isinstance(item, asyncio.Future):
+                item.cancel()
+
+async def _redact_pdf_pymupdf(path: str, output_path: str, privacy_mode: str, mask_regions: Tuple[str, ...] = ()) -> PdfPageSink:
+    """
+    Extracts words with bounding boxes, maps the redaction span table onto them and
+    applies true redaction annotations, so the original layout is kept. mask_regions
+    adds face/signature boxes from a low-resolution render of every page.
+    """
+    sink = PdfPageSink()
+    doc = fitz.open(path)
+
+    async def detect(pages: List[Tuple[int, List[Tuple], Dict]]) -> List[Dict]:
+        # Page renders for a whole batch go to the worker pool together
+        if not mask_regions:
+            return [{} for _ in pages]
+        results = await asyncio.gather(*(
+            _timed(ocr_executor.run(_detect_pdf_page_regions, path, i, VISION_PDF_DPI, mask_regions))
+            for i, _, _ in pages
+        ))
+        for (_, _, route), (regions, seconds) in zip(pages, results):
+            route["vision_seconds"] = seconds
+            route["vision"] = {kind: len(regions[kind]) for kind in mask_regions}
+        return [regions for regions, _ in results]
+
+    async def write_pages(pages: List[Tuple[int, List[Tuple], Dict]], page_regions: List[Dict]):
+        laid_out = [layout_words(words) for _, words, _ in pages]
+        results = await redaction_batcher.redact([text for text, _ in laid_out], mode=privacy_mode)
+        for (i, words, route), (page_text, offsets), (redacted, spans), regions in zip(pages, laid_out, results, page_regions):
+            sink.add(page_text, redacted, spans, route)
+            boxes = [words[w][1] for w in words_in_spans(offsets, spans)]
+            boxes += vision_mask_boxes(regions, [box for _, box, _ in words])
+            if boxes:
+                page = doc[i]
+                for box in boxes:
+                    page.add_redact_annot(fitz.Rect(box), fill=(0, 0, 0))
+                # Removes the underlying text and blanks covered image pixels (scanned pages)
+                page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_PIXELS)
+
+    try:
+        if mask_regions:
+            ocr_executor.admit()
+        batch = []
+        async for i, words, route in iter_pdf_words(doc, path):
+            batch.append((i, words, route))
+            if len(batch) >= REDACT_BATCH_SIZE:
+                await write_pages(batch, await detect(batch))
+                batch = []
+        await write_pages(batch, await detect(batch))
+        # Full rewrite with garbage collection: an incremental save would append the
+        # changes and leave the original, unredacted objects readable in the file
+        doc.save(output_path, garbage=4, deflate=True)
+    except BaseException:
+        sink.close(discard=True)
+        raise
+    finally:
+        doc.close()
+    sink.close()
+    return sink
+
 # ---------- NER Function ----------
 def detect_entities(text: str):
     doc = nlp(text)
     entities = []
     for ent in doc.ents:
         if ent.label_ in ["PERSON", "GPE", "ORG", "DATE", "CARDINAL"]:
-            entities.append({"text": ent.text, "label": ent.label_})
+            entities.append({"text": ent.text, "label": ent.label_, "start": ent.start_char, "end": ent.end_char})
     return entities
 
 # ---------- Computer Vision ----------
-def detect_sensitive_regions(file_path: str):
-    img = cv2.imread(file_path)
-
-    results = {"faces": 0, "signatures": 0}
-
-    # Face detection
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.2, 5)
-    results["faces"] = len(faces)
+VISION_REGIONS = ("faces", "signatures")
+# Regions masked when a request does not say; empty = vision stage off
+VISION_MASK_REGIONS = tuple(r for r in os.getenv("VISION_MASK_REGIONS", "").split(",") if r)
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "800"))      # detection runs on a downscaled copy
+VISION_PDF_DPI = int(os.getenv("VISION_PDF_DPI", "100"))
+VISION_SIGNATURE_MIN_HEIGHT = 12    # px at full size; thinner contours are rules/underlines
+
+@functools.lru_cache(maxsize=None)
+def _face_cascade():
+    # Loaded once per process: each OCR worker keeps its own, none is shared across threads
+    return cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+def _detect_regions(image: np.ndarray, regions: Tuple[str, ...] = VISION_REGIONS) -> Dict:
+    """
+    Face / signature detection on a copy downscaled to VISION_MAX_SIDE; boxes are
+    rescaled to the input's pixel coordinates. Runs in the OCR worker processes.
+    """
+    timings = {}
+    started = time.perf_counter()
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    scale = min(1.0, VISION_MAX_SIDE / max(gray.shape))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    timings["downscale"] = round(time.perf_counter() - started, 4)
+
+    def full_size(x, y, w, h) -> Tuple[int, int, int, int]:
+        return (int(x / scale), int(y / scale), math.ceil((x + w) / scale), math.ceil((y + h) / scale))
+
+    results = {"faces": [], "signatures": []}
+    if "faces" in regions:
+        started = time.perf_counter()
+        faces = _face_cascade().detectMultiScale(small, 1.2, 5)
+        results["faces"] = [full_size(*face) for face in faces]
+        timings["faces"] = round(time.perf_counter() - started, 4)
+
+    if "signatures" in regions:
+        # Simple signature/stamp detection (by contours, very basic)
+        started = time.perf_counter()
+        edges = cv2.Canny(cv2.GaussianBlur(small, (5, 5), 0), 50, 150)
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for c in contours:
+            x, y, w, h = cv2.boundingRect(c)
+            # heuristic for signature shape, thresholds in full-size pixels
+            if w > 100 * scale and VISION_SIGNATURE_MIN_HEIGHT * scale <= h < 100 * scale:
+                results["signatures"].append(full_size(x, y, w, h))
+        timings["signatures"] = round(time.perf_counter() - started, 4)
+
+    results["seconds"] = timings
+    return results
 
-    # Simple signature/stamp detection (by contours, very basic)
-    gray_blur = cv2.GaussianBlur(gray, (5, 5), 0)
-    edges = cv2.Canny(gray_blur, 50, 150)
-    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+def _detect_pdf_page_regions(path: str, page_number: int, resolution: int, regions: Tuple[str, ...]) -> Dict:
+    # Renders in the worker; boxes come back in PDF points for redaction annotations
+    with fitz.open(path) as doc:
+        pix = doc[page_number].get_pixmap(dpi=resolution, colorspace=fitz.csGRAY)
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    results = _detect_regions(image, regions)
+    scale = 72 / resolution
+    for kind in VISION_REGIONS:
+        results[kind] = [tuple(v * scale for v in box) for box in results[kind]]
+    return results
 
-    for c in contours:
-        x, y, w, h = cv2.boundingRect(c)
-        if w > 100 and h < 100:  # heuristic for signature shape
-            results["signatures"] += 1
+def drop_text_regions(boxes: List[Tuple], word_boxes: List[Tuple]) -> List[Tuple]:
+    """Signature candidates that overlap OCR / text-layer words are text lines, not signatures."""
+    if not boxes or not word_boxes:
+        return list(boxes)
+    b = np.asarray(boxes, dtype=np.float64)[:, None, :]
+    w = np.asarray(word_boxes, dtype=np.float64)[None, :, :]
+    overlaps = (b[..., 0] < w[..., 2]) & (w[..., 0] < b[..., 2]) & (b[..., 1] < w[..., 3]) & (w[..., 1] < b[..., 3])
+    return [box for box, hit in zip(boxes, overlaps.any(axis=1)) if not hit]
+
+def vision_mask_boxes(regions: Dict, word_boxes: List[Tuple]) -> List[Tuple]:
+    return list(regions.get("faces", [])) + drop_text_regions(regions.get("signatures", []), word_boxes)
+
+def parse_mask_regions(value: str) -> Tuple[str, ...]:
+    if value is None:
+        return VISION_MASK_REGIONS
+    regions = tuple(r.strip() for r in value.split(",") if r.strip())
+    unknown = set(regions) - set(VISION_REGIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown mask_regions {sorted(unknown)}, expected any of {VISION_REGIONS}")
+    return regions
+
+async def _timed(awaitable) -> Tuple:
+    started = time.perf_counter()
+    result = await awaitable
+    return result, round(time.perf_counter() - started, 4)
 
-    return results
+def detect_sensitive_regions(file_path: str):
+    img = cv2.imread(file_path)
+    regions = _detect_regions(img)
+    return {"faces": len(regions["faces"]), "signatures": len(regions["signatures"])}
 
 # ----------Function for different Privacy modes ----------
+def _entity_dict_spans(text: str, entities: List[Dict]) -> List[Tuple[int, int, str]]:
+    # Prefer character offsets from detect_entities; locate the text otherwise
+    spans = []
+    for ent in entities:
+        if "start" in ent and "end" in ent:
+            spans.append((ent["start"], ent["end"], ent["label"]))
+        elif ent.get("text"):
+            for m in re.finditer(re.escape(ent["text"]), text):
+                spans.append((m.start(), m.end(), ent["label"]))
+    return spans
+
 def apply_privacy_mode(text: str, entities: List[Dict], mode: str) -> str:
     """
     Redacts sensitive info depending on the privacy mode.
@@ -247,14 +1856,12 @@ def apply_privacy_mode(text: str, entities: List[Dict], mode: str) -> str:
 
     if mode == "patient":
         # Keep patient’s own info but redact others
-        for ent in entities:
-            if ent["label"] in ["PERSON", "NAME"] and not ent["is_patient"]:
-                redacted_text = redacted_text.replace(ent["text"], "[REDACTED]")
+        others = [ent for ent in entities if ent["label"] in ["PERSON", "NAME"] and not ent.get("is_patient")]
+        redacted_text, _ = apply_spans(text, _entity_dict_spans(text, others))
     
     elif mode == "research":
         # Full de-identification
-        for ent in entities:
-            redacted_text = redacted_text.replace(ent["text"], "[REDACTED]")
+        redacted_text, _ = apply_spans(text, _entity_dict_spans(text, entities))
         # Date shifting (simple example)
         redacted_text = re.sub(r"\d{4}-\d{2}-\d{2}", "[SHIFTED_DATE]", redacted_text)
         # Location anonymization
@@ -270,8 +1877,7 @@ def apply_privacy_mode(text: str, entities: List[Dict], mode: str) -> str:
 
     elif mode == "legal":
         # Strong redaction for compliance
-        for ent in entities:
-            redacted_text = redacted_text.replace(ent["text"], "[LEGAL_REDACTED]")
+        redacted_text, _ = apply_spans(text, _entity_dict_spans(text, entities), replacement="[LEGAL_REDACTED]")
 
     return redacted_text
 
@@ -331,21 +1937,80 @@ HEADINGS = [
     r"^\s*diagnosis\s*:"
 ]
 
-def _score_category(text: str, patterns: List[str]) -> float:
-    score = 0.0
-    for pat in patterns:
-        matches = re.findall(pat, text, flags=re.IGNORECASE | re.MULTILINE)
-        if matches:
-            # Base presence points + frequency factor
-            score += 2.0 + 0.5 * len(matches)
-    return score
-
-def _heading_bonus(text: str) -> float:
-    bonus = 0.0
-    for pat in HEADINGS:
-        if re.search(pat, text, flags=re.IGNORECASE | re.MULTILINE):
-            bonus += 0.75
-    return bonus
+def _pattern_literal(pat: str) -> str:
+    literal = re.sub(r"\\b|\?:|\(|\)|\[|\]|\||\+|\*|\^|\$|\\", "", pat)
+    return f'{literal[:32]}{"..." if len(literal)>32 else ""}'
+
+class DocumentClassifier:
+    """
+    Category patterns and headings are compiled once. A document is reduced to a
+    single count vector (one scan per unique pattern); scores, probabilities and
+    evidence all come from that vector and a patterns × categories matrix.
+    """
+    def __init__(self, categories: Dict[str, List[str]], headings: List[str]):
+        flags = re.IGNORECASE | re.MULTILINE
+        self.categories = list(categories)
+        self.patterns = list(dict.fromkeys(p for pats in categories.values() for p in pats))
+        self.compiled = [re.compile(p, flags) for p in self.patterns] + [re.compile(h, flags) for h in headings]
+
+        # membership[i, j] = 1 when pattern i belongs to category j
+        index = {p: i for i, p in enumerate(self.patterns)}
+        self.membership = np.zeros((len(self.patterns), len(self.categories)))
+        self.evidence = []
+        for j, (cat, pats) in enumerate(categories.items()):
+            for p in pats:
+                self.membership[index[p], j] = 1.0
+                self.evidence.append((index[p], f'{cat}: matched "{_pattern_literal(p)}"'))
+
+    def count(self, text: str) -> np.ndarray:
+        """Match counts per pattern followed by per heading. Counts of separate chunks can be summed."""
+        return np.array([len(pat.findall(text)) for pat in self.compiled], dtype=float)
+
+    def classify_counts(self, counts: np.ndarray) -> List[Dict]:
+        counts = np.atleast_2d(counts)
+        n = len(self.patterns)
+        pattern_counts, heading_counts = counts[:, :n], counts[:, n:]
+
+        # Base presence points + frequency factor, plus a mild global heading bonus
+        points = np.where(pattern_counts > 0, 2.0 + 0.5 * pattern_counts, 0.0)
+        scores = points @ self.membership
+        scores += ((heading_counts > 0).sum(axis=1) * 0.75 * 0.25)[:, None]
+
+        # Normalize to probabilities
+        totals = scores.sum(axis=1)
+        totals[totals == 0] = 1.0
+        probs = scores / totals[:, None]
+        best = probs.argmax(axis=1)
+
+        results = []
+        for row, j in enumerate(best):
+            label, confidence = self.categories[j], round(float(probs[row, j]), 4)
+            # If everything is super low, call it unknown
+            if scores[row, j] < 1.5:  # tune threshold
+                label, confidence = "unknown", 0.0
+            # Keep only top 6 evidence strings to keep response tidy
+            evidence = [msg for i, msg in self.evidence if pattern_counts[row, i] > 0][:6]
+            results.append({
+                "label": label,
+                "confidence": confidence,
+                "scores": {cat: round(float(v), 3) for cat, v in zip(self.categories, scores[row])},
+                "evidence": evidence
+            })
+        return results
+
+    def classify(self, text: str) -> Dict:
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts: List[str]) -> List[Dict]:
+        results = [{"label": "unknown", "confidence": 0.0, "scores": {}, "evidence": []} for _ in texts]
+        filled = [i for i, t in enumerate(texts) if t and t.strip()]
+        if filled:
+            counts = np.vstack([self.count(texts[i]) for i in filled])
+            for i, result in zip(filled, self.classify_counts(counts)):
+                results[i] = result
+        return results
+
+classifier = DocumentClassifier(DOC_CATEGORIES, HEADINGS)
 
 def classify_document(text: str) -> Dict:
     """
@@ -357,48 +2022,10 @@ def classify_document(text: str) -> Dict:
         'evidence': ['matched: "reference range"', 'matched: "OBX|"', ...]
       }
     """
-    if not text or not text.strip():
-        return {"label": "unknown", "confidence": 0.0, "scores": {}, "evidence": []}
-
-    scores = {}
-    evidence: List[str] = []
-    norm = text
-
-    # Score all categories
-    for cat, pats in DOC_CATEGORIES.items():
-        s = _score_category(norm, pats)
-        scores[cat] = s
-
-    # Mild global heading bonus to all (helps clinical formats)
-    hb = _heading_bonus(norm)
-    for cat in scores:
-        scores[cat] += hb * 0.25
-
-    # Track evidence by showing top-matching regex tokens
-    for cat, pats in DOC_CATEGORIES.items():
-        for pat in pats:
-            if re.search(pat, norm, flags=re.IGNORECASE | re.MULTILINE):
-                # add a short explanation once per pattern
-                literal = re.sub(r"\\b|\?:|\(|\)|\[|\]|\||\+|\*|\^|\$|\\", "", pat)
-                evidence.append(f'{cat}: matched "{literal[:32]}{"..." if len(literal)>32 else ""}"')
-
-    # Normalize to probabilities
-    total = sum(scores.values()) or 1.0
-    probs = {k: (v / total) for k, v in scores.items()}
-    label = max(probs.items(), key=lambda kv: kv[1])[0]
-    confidence = round(probs[label], 4)
-
-    # If everything is super low, call it unknown
-    if scores[label] < 1.5:  # tune threshold
-        label, confidence = "unknown", 0.0
-
-    # Keep only top 6 evidence strings to keep response tidy
-    return {
-        "label": label,
-        "confidence": confidence,
-        "scores": {k: round(v, 3) for k, v in scores.items()},
-        "evidence": evidence[:6]
-    }
+    return classifier.classify(text)
+
+def classify_batch(texts: List[str]) -> List[Dict]:
+    return classifier.classify_batch(texts)
 
 # ---------- Send SMS ----------
 def send_sms(message: str):
@@ -412,23 +2039,21 @@ def send_sms(message: str):
 async def add_audit_entry_async(doc_id: str, action: str, user: str):
     timestamp = datetime.now(timezone.utc)
     fingerprint = hashlib.sha256(f"{doc_id}{action}{timestamp}".encode()).hexdigest()
-    db = SessionLocal()
-    entry = AuditLog(
-        doc_id=doc_id,
-        action=action,
-        user=user,
-        timestamp=timestamp,
-        fingerprint=fingerprint
-    )
-    db.add(entry)
-    db.commit()
-    db.refresh(entry)
-    db.close()
-    return entry
-
-async def audit_file(file_content: str, filename: str, user: str, background_tasks: BackgroundTasks):
-    # HIPAA compliance check
-    violations = check_hipaa_compliance(file_content)
+    row = {"doc_id": doc_id, "action": action, "user": user, "timestamp": timestamp, "fingerprint": fingerprint}
+    # The row is group-committed by audit_writer; the caller only needs the fingerprint back
+    audit_writer.submit(row)
+    return AuditLog(**row)
+
+def ledger_receipt(entry) -> Dict:
+    # Batched ledger entries are anchored later; point the caller at their proof
+    return {"ledger_event": entry.receipt()} if isinstance(entry, LedgerEvent) else {}
+
+async def audit_file(file_content, filename: str, user: str, background_tasks: BackgroundTasks, findings: Dict = None):
+    # HIPAA compliance check (file_content may be a string or an iterable of chunks,
+    # or skipped when the caller already ran a HipaaScanner over the content)
+    if findings is None:
+        findings = scan_hipaa(file_content)
+    violations = findings["violations"]
     risk = "high" if violations else "low"
 
     # DB audit log
@@ -449,6 +2074,7 @@ async def audit_file(file_content: str, filename: str, user: str, background_tas
 
     return {
         "violations": violations,
+        "findings": {"counts": findings["counts"], "hits": findings["hits"]},
         "risk": risk,
         "audit_log": {
             "doc_id": entry.doc_id,
@@ -457,7 +2083,8 @@ async def audit_file(file_content: str, filename: str, user: str, background_tas
             "timestamp": entry.timestamp,
             "fingerprint": entry.fingerprint
         },
-        "blockchain_hash": blockchain_entry.hash
+        "blockchain_hash": blockchain_entry.hash,
+        **ledger_receipt(blockchain_entry)
     }
 
 # Utility to save and return download path
@@ -467,68 +2094,253 @@ def save_redacted_file(content: bytes, ext: str) -> str:
         f.write(content)
     return temp_file.name
 
+def redacted_output(filename: str) -> Tuple[str, str]:
+    """
+    Unique (download name, path) in the redacted dir for an upload. Concurrent jobs with
+    the same filename (IM0001.dcm from two series, report.pdf from two departments)
+    must never write, append to, or be downloaded as the same file.
+    """
+    redacted_dir = os.path.join(tempfile.gettempdir(), "redacted")
+    os.makedirs(redacted_dir, exist_ok=True)
+    name = f"{uuid.uuid4().hex[:12]}_{os.path.basename(filename)}"
+    return name, os.path.join(redacted_dir, name)
+
+# ---------- Result Cache ----------
+# Bump PIPELINE_REVISION whenever redaction / classification output changes
+PIPELINE_REVISION = "3"
+PIPELINE_VERSION = f"{nlp.meta.get('lang')}_{nlp.meta.get('name')}-{nlp.meta.get('version')}-r{PIPELINE_REVISION}"
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "medvault_cache", "results"))
+RESULT_CACHE_MEMORY_ITEMS = int(os.getenv("RESULT_CACHE_MEMORY_ITEMS", "256"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+
+class ResultCache:
+    """
+    Content-addressed cache of processing results. Keys are the SHA-256 of the upload
+    plus endpoint, options, privacy mode and PIPELINE_VERSION. An in-memory LRU sits in
+    front of an on-disk tier: one directory per key holding entry.json (result, audit
+    findings, span tables, classification), text.txt and the redacted artifact.
+    """
+    def __init__(self, directory: str, memory_items: int, max_bytes: int, ttl: int):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._disk_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, digest: str, kind: str, privacy_mode: str, **options) -> str:
+        raw = json.dumps([digest, kind, privacy_mode, PIPELINE_VERSION, options], sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _remember(self, key: str, entry: Dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        if not RESULT_CACHE_ENABLED:
+            return None
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with open(os.path.join(self._entry_dir(key), "entry.json"), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+
+        if entry is None or time.time() - entry["created"] > self.ttl:
+            if entry is not None:
+                self.delete(key)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(self._entry_dir(key))  # mtime drives LRU eviction on disk
+        except OSError:
+            # Evicted on disk (possibly by another worker) while still in memory
+            self._memory.pop(key, None)
+            self.misses += 1
+            return None
+        self._remember(key, entry)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict, artifact_path: str = None, text: str = None, text_path: str = None):
+        """Stores an entry; text_path (a temp file) is moved into the cache and always consumed."""
+        if not RESULT_CACHE_ENABLED:
+            if text_path:
+                os.remove(text_path)
+            return
+
+        entry = dict(entry, created=time.time(), artifact=None)
+        tmp_dir = tempfile.mkdtemp(dir=self.directory, prefix=".tmp_")
+        if artifact_path and os.path.exists(artifact_path):
+            entry["artifact"] = "artifact" + os.path.splitext(artifact_path)[1]
+            shutil.copyfile(artifact_path, os.path.join(tmp_dir, entry["artifact"]))
+        if text_path:
+            shutil.move(text_path, os.path.join(tmp_dir, "text.txt"))
+        elif text is not None:
+            with open(os.path.join(tmp_dir, "text.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+        with open(os.path.join(tmp_dir, "entry.json"), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+
+        # Swap the finished directory into place (another worker may have won the race)
+        target = self._entry_dir(key)
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._remember(key, entry)
+
+        if self._disk_bytes is not None:
+            self._disk_bytes += self._dir_size(target)
+        if self._disk_bytes is None or self._disk_bytes > self.max_bytes:
+            self.evict()
+
+    def restore_artifact(self, key: str, entry: Dict, dest_path: str) -> bool:
+        if not entry.get("artifact"):
+            return False
+        try:
+            shutil.copyfile(os.path.join(self._entry_dir(key), entry["artifact"]), dest_path)
+            return True
+        except OSError:
+            return False
+
+    def text(self, key: str) -> str:
+        with open(os.path.join(self._entry_dir(key), "text.txt"), encoding="utf-8") as f:
+            return f.read()
+
+    def delete(self, key: str):
+        self._memory.pop(key, None)
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones until under 90% of max_bytes."""
+        entries = []
+        now = time.time()
+        for e in os.scandir(self.directory):
+            if not e.is_dir() or e.name.startswith(".tmp_"):
+                continue
+            mtime = e.stat().st_mtime
+            if now - mtime > self.ttl:
+                self.delete(e.name)
+                continue
+            entries.append((mtime, e.name, self._dir_size(e.path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes * 0.9:
+                break
+            self.delete(key)
+            total -= size
+        self._disk_bytes = total
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": RESULT_CACHE_ENABLED,
+            "pipeline_version": PIPELINE_VERSION,
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes
+        }
+
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MEMORY_ITEMS, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL)
+
+def audit_record(audit_info: Dict, suffix: str = "") -> Dict:
+    # What a cache hit needs to replay audit_file without re-scanning the content.
+    # Only the doc_id suffix (e.g. "_page_3") is kept: a re-upload is audited under its own filename
+    return {"suffix": suffix, "findings": {"violations": audit_info["violations"], **audit_info["findings"]}}
+
+async def replay_audits(entry: Dict, filename: str, user: str, background_tasks: BackgroundTasks) -> List[Dict]:
+    return [
+        await audit_file(None, f"{filename}{record['suffix']}", user, background_tasks, findings=record["findings"])
+        for record in entry["audits"]
+    ]
+
+# ---------- Image Redaction ----------
+def mask_boxes(image: np.ndarray, boxes: List[Tuple], fill=0):
+    """Blacks out all (x0, y0, x1, y1) boxes with one vectorized assignment."""
+    if boxes:
+        image[box_mask(image.shape[:2], boxes)] = fill
+
 # ---------- PDF Processing ----------
 @app.post("/process/pdf")
 async def process_pdf(
     file: UploadFile = File(...),
     user: str = "admin",
     background_tasks: BackgroundTasks = None,
-    privacy_mode: str = "research"
+    privacy_mode: str = "research",
+    pdf_engine: str = None,             # "pdfplumber" (re-drawn text) or "pymupdf" (in-place)
+    mask_regions: str = None            # e.g. "faces,signatures"
 ):
-    contents = await file.read()
-    pages_text = []
-
-    # Try extracting text page by page
-    with pdfplumber.open(io.BytesIO(contents)) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                pages_text.append(text)
-
-    # Fallback: OCR if no text layer found in any page
-    if not pages_text:
-        with pdfplumber.open(io.BytesIO(contents)) as pdf:
-            for page in pdf.pages:
-                image = page.to_image(resolution=300).original
-                text = pytesseract.image_to_string(image)
-                pages_text.append(text)
-
-    # Redact each page individually
-    redacted_pages = [redact_text(page, mode=privacy_mode) for page in pages_text]
-
-    # Join all pages for classification + auditing
-    full_text = "\n".join(pages_text)
-    audit_info = await audit_file(full_text, file.filename, user, background_tasks)
-    classification = classify_document(full_text)
+    engine = pdf_engine or PDF_ENGINE
+    if engine not in PDF_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown pdf_engine {engine}, expected one of {PDF_ENGINES}")
+    # pdfplumber re-draws text only, images never reach its output, so there is nothing to mask
+    regions = parse_mask_regions(mask_regions) if engine == "pymupdf" else ()
+
+    # Spool to disk and run extraction → redaction → writing page by page,
+    # holding at most REDACT_BATCH_SIZE pages of text in memory
+    path, digest = await spool_upload(file, ".pdf")
+
+    output_name, output_path = redacted_output(file.filename)
+
+    # Same bytes + mode + engine already processed → skip straight to audit logging
+    cache_key = result_cache.key(digest, "pdf", privacy_mode, engine=engine, mask_regions=list(regions))
+    cached = result_cache.get(cache_key)
+    if cached and result_cache.restore_artifact(cache_key, cached, output_path):
+        os.remove(path)
+        result = dict(cached["result"], cache="hit", download_url=f"/download/{output_name}")
+        result["compliance"] = (await replay_audits(cached, file.filename, user, background_tasks))[0]
+        return result
 
-    # --- Create redacted PDF (preserving page structure) ---
-    redacted_dir = os.path.join(tempfile.gettempdir(), "redacted")
-    os.makedirs(redacted_dir, exist_ok=True)
-
-    output_path = os.path.join(redacted_dir, file.filename)
-    packet = io.BytesIO()
-    c = canvas.Canvas(packet, pagesize=letter)
-
-    for page_text in redacted_pages:
-        text_object = c.beginText(40, 750)  # margins
-        for line in page_text.split("\n"):
-            text_object.textLine(line)
-        c.drawText(text_object)
-        c.showPage()  # new page for next
-    c.save()
+    try:
+        if engine == "pymupdf":
+            sink = await _redact_pdf_pymupdf(path, output_path, privacy_mode, mask_regions=regions)
+        else:
+            sink = await _redact_pdf_pdfplumber(path, output_path, privacy_mode)
+    finally:
+        os.remove(path)
 
-    with open(output_path, "wb") as f:
-        f.write(packet.getvalue())
+    audit_info = await audit_file(None, file.filename, user, background_tasks, findings=sink.scanner.result())
+    classification = sink.classification()
 
-    return {
-        "original_pages": [p[:500] for p in pages_text],      # first 500 chars per page
-        "redacted_pages": [r[:500] for r in redacted_pages],  # redacted preview per page
-        "compliance": audit_info,
+    result = {
+        "original_pages": sink.original_previews,
+        "redacted_pages": sink.redacted_previews,
+        "compliance": None,
         "privacy_mode": privacy_mode,
         "classification": classification,
-        "page_count": len(pages_text),
-        "download_url": f"/download/{file.filename}" # endpoint to fetch file
+        "page_count": len(sink.original_previews),
+        "page_routes": sink.routes,                   # text layer vs OCR per page
+        "pdf_engine": engine,
+        "mask_regions": list(regions),
+        "download_url": f"/download/{output_name}" # endpoint to fetch file
     }
+    result_cache.put(
+        cache_key,
+        {"result": result, "audits": [audit_record(audit_info)], "spans": sink.spans},
+        artifact_path=output_path,
+        text_path=sink.text_file.name
+    )
+    return dict(result, compliance=audit_info, cache="miss")
 
 # ---------- Image Processing (JPEG, PNG, TIFF) ----------
 @app.post("/process/image")
@@ -536,130 +2348,711 @@ async def process_image(
     file: UploadFile = File(...),
     user: str = "admin",
     background_tasks: BackgroundTasks = None,
-    privacy_mode: str = "research"
+    privacy_mode: str = "research",
+    mask_regions: str = None            # e.g. "faces,signatures"
 ):
+    regions = parse_mask_regions(mask_regions)
     contents = await file.read()
-    np_img = np.frombuffer(contents, np.uint8)
-
-    # Try to decode as a single-page image
-    img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
-    texts = []
-
-    if img is not None:
-        # OCR with bounding boxes
-        data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-        text = " ".join(data["text"])
-        texts.append(text)
-
-        # (Optional) mask all detected words → if you want to blackout everything
-        for i, word in enumerate(data["text"]):
-            if word.strip():
-                (x, y, w, h) = (
-                    data["left"][i],
-                    data["top"][i],
-                    data["width"][i],
-                    data["height"][i],
-                )
-                cv2.rectangle(img, (x, y), (x + w, y + h), (0, 0, 0), -1)
 
-        # Save redacted image
+    # Same bytes + mode already processed → skip straight to audit logging
+    cache_key = result_cache.key(hashlib.sha256(contents).hexdigest(), "image", privacy_mode, mask_regions=list(regions))
+    cached = result_cache.get(cache_key)
+    if cached:
         redacted_dir = os.path.join(tempfile.gettempdir(), "redacted")
         os.makedirs(redacted_dir, exist_ok=True)
-
-        redacted_filename = f"redacted_{uuid.uuid4()}.png"
+        redacted_filename = f"redacted_{uuid.uuid4()}{os.path.splitext(cached['artifact'] or '')[1]}"
         redacted_path = os.path.join(redacted_dir, redacted_filename)
-        cv2.imwrite(redacted_path, img)
+        if result_cache.restore_artifact(cache_key, cached, redacted_path):
+            result = dict(cached["result"], cache="hit", download_url=f"/download/{redacted_filename}")
+            result["compliance"] = (await replay_audits(cached, file.filename, user, background_tasks))[0]
+            return result
 
-    else:
-        # Multi-page TIFF handling
+    timings = {}
+    started = time.perf_counter()
+
+    # Multi-page TIFFs go frame by frame through PIL, everything else through OpenCV
+    try:
         pil_img = Image.open(io.BytesIO(contents))
-        frame_texts = []
-        for frame in range(0, getattr(pil_img, "n_frames", 1)):
-            pil_img.seek(frame)
-            frame_text = pytesseract.image_to_string(pil_img)
-            frame_texts.append(frame_text)
-        texts.extend(frame_texts)
-
-        # Save TIFF without any bounding box redaction
+        n_frames = getattr(pil_img, "n_frames", 1)
+    except Exception:
+        n_frames = 1
+    if n_frames > 1:
+        frames = [np.array(frame.convert("RGB")) for frame in ImageSequence.Iterator(pil_img)]
+    else:
+        img = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise HTTPException(status_code=400, detail=f"Could not decode image {file.filename}")
+        frames = [img]
+    timings["decode"] = round(time.perf_counter() - started, 4)
+
+    # OCR with bounding boxes and (optionally) face/signature detection, both batched
+    # over all frames in the worker pool at the same time
+    (frames_data, timings["ocr"]), (frames_regions, timings["vision"]) = await asyncio.gather(
+        _timed(ocr_executor.map(_ocr_image_to_data, [(frame,) for frame in frames])),
+        _timed(ocr_executor.map(_detect_regions, [(frame, regions) for frame in frames]) if regions else asyncio.sleep(0, [{}] * len(frames)))
+    )
+    frames_words = [_ocr_data_words(data) for data in frames_data]
+
+    # Mask only the words the mode's span table covers, plus detected regions
+    started = time.perf_counter()
+    pages = await redact_word_pages(frames_words, mode=privacy_mode)
+    timings["redact"] = round(time.perf_counter() - started, 4)
+    started = time.perf_counter()
+    for frame, words, page, found in zip(frames, frames_words, pages, frames_regions):
+        word_boxes = [box for _, box, _ in words]
+        mask_boxes(frame, [word_boxes[i] for i in page["words"]] + vision_mask_boxes(found, word_boxes))
+    timings["mask"] = round(time.perf_counter() - started, 4)
+    started = time.perf_counter()
+
+    # Save redacted image
+    redacted_dir = os.path.join(tempfile.gettempdir(), "redacted")
+    os.makedirs(redacted_dir, exist_ok=True)
+    if n_frames > 1:
         redacted_filename = f"redacted_{uuid.uuid4()}.tiff"
-        redacted_path = os.path.join("/tmp", redacted_filename)
-        pil_img.save(redacted_path)
-
-    full_text = "\n".join(texts)
+        redacted_path = os.path.join(redacted_dir, redacted_filename)
+        first, *rest = [Image.fromarray(frame) for frame in frames]
+        first.save(redacted_path, save_all=True, append_images=rest)
+    else:
+        redacted_filename = f"redacted_{uuid.uuid4()}.png"
+        redacted_path = os.path.join(redacted_dir, redacted_filename)
+        cv2.imwrite(redacted_path, frames[0])
+    timings["save"] = round(time.perf_counter() - started, 4)
 
-    # Use your existing text redaction + classification
-    redacted_text = redact_text(full_text, mode=privacy_mode)
+    full_text = "\n".join(page["text"] for page in pages)
+    redacted_text = "\n".join(page["redacted"] for page in pages)
     classification = classify_document(full_text)
     audit_info = await audit_file(full_text, file.filename, user, background_tasks)
 
-    return {
+    result = {
         "original": full_text[:500],
         "redacted": redacted_text[:500],
-        "compliance": audit_info,
+        "compliance": None,
         "privacy_mode": privacy_mode,
         "classification": classification,
-        "pages": len(texts),
+        "pages": len(frames),
+        "masked_words": sum(len(page["words"]) for page in pages),
+        "mask_regions": list(regions),
+        "vision": [
+            {kind: len(found[kind]) for kind in regions} | {"seconds": found["seconds"]}
+            for found in frames_regions
+        ] if regions else None,
+        "timings": timings,
         "download_url": f"/download/{redacted_filename}"  # 👈 allows download
     }
+    spans = [page["spans"] for page in pages]
+    result_cache.put(
+        cache_key,
+        {"result": result, "audits": [audit_record(audit_info)], "spans": spans},
+        artifact_path=redacted_path,
+        text=full_text
+    )
+    return dict(result, compliance=audit_info, cache="miss")
+
+# ---------- DICOM De-identification Profiles ----------
+# Actions (PS3.15 Annex E codes, plus H and S):
+#   X remove, Z empty value, D dummy value, U remap UID, H hash (stable pseudonym),
+#   S shift date, K keep
+DICOM_BASIC_PROFILE = {
+    # Patient identity
+    "PatientName": "D", "PatientID": "D", "IssuerOfPatientID": "X", "OtherPatientIDs": "X",
+    "OtherPatientIDsSequence": "X", "OtherPatientNames": "X", "PatientBirthName": "X",
+    "PatientMotherBirthName": "X", "PatientBirthDate": "Z", "PatientBirthTime": "X",
+    "PatientAddress": "X", "PatientTelephoneNumbers": "X", "CountryOfResidence": "X",
+    "RegionOfResidence": "X", "MilitaryRank": "X", "BranchOfService": "X", "MedicalRecordLocator": "X",
+    "PatientInsurancePlanCodeSequence": "X", "PatientReligiousPreference": "X", "PatientComments": "X",
+    "ReferencedPatientSequence": "X", "Occupation": "X",
+    # Patient characteristics
+    "PatientSex": "Z", "PatientAge": "X", "PatientSize": "X", "PatientWeight": "X", "EthnicGroup": "X",
+    "PregnancyStatus": "X", "SmokingStatus": "X", "MedicalAlerts": "X", "Allergies": "X",
+    "AdditionalPatientHistory": "X",
+    # Visit / order / procedure
+    "AccessionNumber": "Z", "StudyID": "Z", "AdmissionID": "X", "AdmittingDiagnosesDescription": "X",
+    "RequestAttributesSequence": "X", "RequestedProcedureID": "X", "ScheduledProcedureStepID": "X",
+    "PerformedProcedureStepID": "X", "PerformedProcedureStepDescription": "X",
+    "StudyDescription": "X", "SeriesDescription": "X", "ProtocolName": "X", "ImageComments": "X",
+    # Staff and institution
+    "ReferringPhysicianName": "Z", "ReferringPhysicianAddress": "X", "ReferringPhysicianTelephoneNumbers": "X",
+    "ReferringPhysicianIdentificationSequence": "X", "PhysiciansOfRecord": "X", "PerformingPhysicianName": "X",
+    "NameOfPhysiciansReadingStudy": "X", "OperatorsName": "X", "RequestingPhysician": "X",
+    "ScheduledPerformingPhysicianName": "X", "ContentCreatorName": "Z",
+    "InstitutionName": "X", "InstitutionAddress": "X", "InstitutionalDepartmentName": "X",
+    "StationName": "X", "DeviceSerialNumber": "X",
+    # Signatures / encrypted or original values / padding (usually found after Pixel Data)
+    "DigitalSignaturesSequence": "X", "MACParametersSequence": "X", "EncryptedAttributesSequence": "X",
+    "OriginalAttributesSequence": "X", "DataSetTrailingPadding": "X",
+}
+# Dates / times covered by the temporal retention options
+DICOM_TEMPORAL_KEYWORDS = [
+    "StudyDate", "SeriesDate", "AcquisitionDate", "ContentDate", "InstanceCreationDate",
+    "PerformedProcedureStepStartDate", "ScheduledProcedureStepStartDate", "AcquisitionDateTime",
+    "StudyTime", "SeriesTime", "AcquisitionTime", "ContentTime", "InstanceCreationTime",
+    "PerformedProcedureStepStartTime",
+]
+DICOM_CHARACTERISTICS_KEYWORDS = [
+    "PatientSex", "PatientAge", "PatientSize", "PatientWeight", "EthnicGroup", "PregnancyStatus", "SmokingStatus"
+]
+# UIDs that name standard things (classes, syntaxes) and carry no identity
+DICOM_UID_KEEP = {"TransferSyntaxUID", "CodingSchemeUID", "ContextGroupExtensionCreatorUID", "MappingResourceUID"}
+
+# Options per privacy mode (PS3.15 Table E.1-1 option columns, plus pseudonymous IDs)
+DICOM_MODE_OPTIONS = {
+    "research": {"shift_dates", "retain_patient_characteristics", "pseudonymize_ids"},  # keep conditions, link studies
+    "patient": {"retain_full_dates", "pseudonymize_ids"},
+    "insurance": {"retain_full_dates", "retain_patient_characteristics", "pseudonymize_ids"},
+    "legal": set()                                                                       # basic profile only
+}
+DICOM_DEID_CODES = {    # DCM codes for DeidentificationMethodCodeSequence
+    "basic": ("113100", "Basic Application Confidentiality Profile"),
+    "shift_dates": ("113107", "Retain Longitudinal Temporal Information Modified Dates Option"),
+    "retain_full_dates": ("113106", "Retain Longitudinal Temporal Information Full Dates Option"),
+    "retain_patient_characteristics": ("113108", "Retain Patient Characteristics Option"),
+}
 
-# ---------- DICOM Medical Scan Processing ----------
-@app.post("/process/dicom")
-async def process_dicom(
-    files: List[UploadFile] = File(...),
-    user: str = "admin",
-    background_tasks: BackgroundTasks = None,
-    privacy_mode: str = "research"
-):
-    results = []
-    output_files = []
-
-    # Define DICOM tags to redact by mode
-    MODE_DICOM_TAGS = {
-        "research": ["PatientName", "PatientID"],  
-        "patient": ["PatientName", "PatientID", "PatientBirthDate", "PatientSex"],
-        "insurance": ["PatientName", "PatientID", "PatientBirthDate"],
-        "legal": ["PatientName", "PatientID", "PatientBirthDate", "PatientSex"]
-    }
+DICOM_UID_SALT = os.getenv("DICOM_UID_SALT", "")      # per-deployment secret; generated below when unset
+DICOM_SECRET_PATH = os.getenv("DICOM_SECRET_PATH", "./medvault_dicom.key")
+DICOM_UID_CACHE_SIZE = int(os.getenv("DICOM_UID_CACHE_SIZE", "200000"))
+DICOM_DATE_SHIFT_MAX_DAYS = int(os.getenv("DICOM_DATE_SHIFT_MAX_DAYS", "365"))
+DICOM_DUMMY_VALUES = {
+    "PN": "REDACTED", "DA": "19000101", "TM": "000000", "DT": "19000101000000", "AS": "000Y",
+    "US": 0, "SS": 0, "UL": 0, "SL": 0, "FL": 0.0, "FD": 0.0, "IS": "0", "DS": "0",
+}
 
-    # Default tags if mode not found
-    tags_to_redact = MODE_DICOM_TAGS.get(privacy_mode, ["PatientName", "PatientID"])
+def _dicom_secret() -> bytes:
+    """
+    HMAC key for UIDs, pseudonyms and date shifts. Without one, pseudonymised MRNs
+    (and the dates shifted by them) can be brute-forced back, so when DICOM_UID_SALT
+    is unset a random key is generated once and persisted at DICOM_SECRET_PATH for
+    every worker on the host. If it cannot be persisted the key is random per
+    process: mappings then don't carry across restarts, but stay unguessable.
+    """
+    if DICOM_UID_SALT:
+        return DICOM_UID_SALT.encode()
+    try:
+        with open(DICOM_SECRET_PATH, "rb") as f:
+            key = f.read().strip()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return secrets.token_bytes(32)
+
+    key = secrets.token_hex(32).encode()
+    tmp_path = f"{DICOM_SECRET_PATH}.{os.getpid()}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        # link() refuses to overwrite, so concurrent workers all end up with the first key written
+        try:
+            os.link(tmp_path, DICOM_SECRET_PATH)
+        except FileExistsError:
+            with open(DICOM_SECRET_PATH, "rb") as f:
+                key = f.read().strip()
+        finally:
+            os.remove(tmp_path)
+    except OSError:
+        return secrets.token_bytes(32)
+    return key
 
-    redacted_dir = os.path.join(tempfile.gettempdir(), "redacted")
-    os.makedirs(redacted_dir, exist_ok=True)
+DICOM_SECRET = _dicom_secret()
 
-    for file in files:
-        contents = await file.read()
-        ds = pydicom.dcmread(io.BytesIO(contents))
+def _keyed_hash(label: str, value: str) -> bytes:
+    return hmac.new(DICOM_SECRET, f"{label}|{value}".encode(), hashlib.sha256).digest()
+
+@functools.lru_cache(maxsize=DICOM_UID_CACHE_SIZE)
+def remap_uid(uid: str) -> str:
+    """
+    Deterministic UID replacement: a 2.25 (UUID-derived) UID from a keyed hash, so
+    the same original UID maps to the same new one in every file, series and worker.
+    """
+    return f"2.25.{int.from_bytes(_keyed_hash('uid', uid)[:16], 'big')}"
 
-        # Extract metadata (before redaction)
-        metadata = {elem.keyword: str(elem.value) for elem in ds if elem.keyword}
+def _pseudonym(value: str) -> str:
+    return _keyed_hash("id", value).hex()[:16].upper()
 
-        # Apply redaction
-        for tag in tags_to_redact:
-            if tag in ds:
-                ds.data_element(tag).value = "REDACTED"
+def _shift_date(value: str, days: int) -> str:
+    # DA "YYYYMMDD"; DT keeps its time/offset suffix
+    try:
+        shifted = datetime.strptime(value[:8], "%Y%m%d") - timedelta(days=days)
+    except ValueError:
+        return ""
+    return shifted.strftime("%Y%m%d") + value[8:]
+
+class DicomProfile:
+    """
+    A privacy mode compiled into a tag → action table. apply() does one walk over the
+    data set (descending into sequences) and touches only elements that need an action;
+    anything not in the table is resolved by rule once per tag and memoised.
+    """
+    def __init__(self, mode: str, options: set):
+        self.mode = mode
+        self.options = options
+        table = dict(DICOM_BASIC_PROFILE)
+        temporal = "S" if "shift_dates" in options else "K" if "retain_full_dates" in options else "Z"
+        table.update({keyword: temporal for keyword in DICOM_TEMPORAL_KEYWORDS})
+        if "retain_patient_characteristics" in options:
+            table.update({keyword: "K" for keyword in DICOM_CHARACTERISTICS_KEYWORDS})
+        if "pseudonymize_ids" in options:
+            table.update({"PatientID": "H", "AccessionNumber": "H", "StudyID": "H"})
+
+        self.actions = {}
+        for keyword, action in table.items():
+            tag = pydicom.datadict.tag_for_keyword(keyword)
+            if tag is not None:
+                self.actions[tag] = action
+
+        codes = ["basic"] + [option for option in ("shift_dates", "retain_full_dates", "retain_patient_characteristics") if option in options]
+        self.method_codes = [DICOM_DEID_CODES[code] for code in codes]
+
+    def _rule(self, tag) -> str:
+        """Action for a tag that is not in the table; None means keep (or descend into a sequence)."""
+        if tag.element == 0:
+            return "X"      # group lengths go stale once values change
+        if tag.is_private:
+            return "X"
+        if tag.group & 0xFF00 == 0x5000 or (tag.group & 0xFF00 == 0x6000 and tag.element in (0x3000, 0x4000)):
+            return "X"      # curve data, overlay data/comments
+        keyword = pydicom.datadict.keyword_for_tag(tag)
+        try:
+            vr = pydicom.datadict.dictionary_VR(tag)
+        except KeyError:
+            return None
+        if vr == "UI" and not keyword.endswith("ClassUID") and keyword not in DICOM_UID_KEEP:
+            return "U"
+        return None
+
+    def action(self, tag) -> str:
+        if tag not in self.actions:
+            self.actions[tag] = self._rule(tag)
+        return self.actions[tag]
+
+    def apply(self, ds) -> Dict:
+        """De-identifies ds in place; returns per-action counts and the replaced identifying values."""
+        context = {
+            "counts": Counter(),
+            "replaced": [],
+            # One offset per patient keeps intervals between studies intact
+            "shift": int(_pseudonym(str(ds.get("PatientID", ""))), 16) % DICOM_DATE_SHIFT_MAX_DAYS + 1
+        }
+        self._walk(ds, context)
+
+        if "MediaStorageSOPInstanceUID" in getattr(ds, "file_meta", {}):
+            ds.file_meta.MediaStorageSOPInstanceUID = remap_uid(str(ds.file_meta.MediaStorageSOPInstanceUID))
+        ds.PatientIdentityRemoved = "YES"
+        ds.DeidentificationMethod = f"MedVault {self.mode} profile (PS3.15)"
+        items = []
+        for value, meaning in self.method_codes:
+            item = pydicom.Dataset()
+            item.CodeValue, item.CodingSchemeDesignator, item.CodeMeaning = value, "DCM", meaning
+            items.append(item)
+        ds.DeidentificationMethodCodeSequence = items
+        return {"counts": dict(context["counts"]), "replaced": context["replaced"]}
+
+    def _walk(self, ds, context: Dict):
+        remove = []
+        for tag in list(ds.keys()):
+            action = self.action(tag)
+            if action is None or action == "K":
+                elem = ds.get_item(tag)
+                if action is None and elem.VR == "SQ":
+                    for item in ds[tag].value:
+                        self._walk(item, context)
+                continue
+
+            context["counts"][action] += 1
+            if action == "X":
+                remove.append(tag)
+                continue
+
+            vr = ds.get_item(tag).VR or pydicom.datadict.dictionary_VR(tag).split(" or ")[0]
+            if action == "Z":
+                ds[tag] = pydicom.DataElement(tag, vr, None if vr in ("US", "SS", "UL", "SL", "FL", "FD") else "")
+            elif action == "D":
+                ds[tag] = pydicom.DataElement(tag, vr, DICOM_DUMMY_VALUES.get(vr, "REDACTED"))
+                context["replaced"].append(str(ds[tag].value))
+            else:
+                elem = ds[tag]      # converts (and reads, if deferred) only the values we rewrite
+                values = elem.value if isinstance(elem.value, pydicom.multival.MultiValue) else [elem.value]
+                if action == "U":
+                    new = [remap_uid(str(v)) for v in values if v]
+                elif action == "H":
+                    new = [_pseudonym(str(v)) for v in values if v]
+                    context["replaced"].extend(new)
+                else:   # "S"
+                    new = [_shift_date(str(v), context["shift"]) for v in values if v] if vr in ("DA", "DT") else values
+                elem.value = new if len(new) > 1 else (new[0] if new else "")
+        for tag in remove:
+            del ds[tag]
+
+DICOM_PROFILES = {mode: DicomProfile(mode, options) for mode, options in DICOM_MODE_OPTIONS.items()}
+
+def dicom_profile(mode: str) -> DicomProfile:
+    # Unknown modes get the strictest profile
+    return DICOM_PROFILES.get(mode, DICOM_PROFILES["legal"])
 
-        # Save redacted DICOM
-        output_path = os.path.join(redacted_dir, file.filename)
+# ---------- DICOM Medical Scan Processing ----------
+DICOM_WORKERS = int(os.getenv("DICOM_WORKERS", "8"))
+DICOM_DEFER_SIZE = int(os.getenv("DICOM_DEFER_SIZE", "4096"))   # larger values stay on disk until written
+DICOM_BINARY_VRS = {"OB", "OD", "OF", "OL", "OV", "OW", "UN"}
+
+def _dicom_metadata(ds) -> Dict:
+    """keyword → value as text; binary values and sequences are summarised, not stringified."""
+    metadata = {}
+    for raw in ds.elements():   # raw elements: nothing is converted or read unless we ask
+        keyword = pydicom.datadict.keyword_for_tag(raw.tag)
+        if not keyword:
+            continue
+        vr = raw.VR or pydicom.datadict.dictionary_VR(raw.tag)    # implicit VR files
+        if set(vr.split(" or ")) & DICOM_BINARY_VRS:
+            length = getattr(raw, "length", None)
+            metadata[keyword] = f"<{vr} {length} bytes>" if length is not None else f"<{vr}>"
+        elif vr == "SQ":
+            metadata[keyword] = f"<SQ {len(ds[raw.tag].value)} items>"
+        else:
+            metadata[keyword] = str(ds[raw.tag].value)
+    return metadata
+
+DICOM_LONG_VRS = {b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"SV", b"UC", b"UN", b"UR", b"UT", b"UV"}
+PIXEL_DATA_TAGS = {0x7FE00008, 0x7FE00009, 0x7FE00010}
+
+def _pixel_data_end(fp, offset: int, implicit: bool, little: bool) -> int:
+    """
+    File offset just past the pixel data element starting at offset (or offset itself
+    when there is none). Only element and fragment headers are read, never the pixels.
+    """
+    endian = "<" if little else ">"
+    fp.seek(offset)
+    header = fp.read(8)
+    if len(header) < 8:
+        return offset
+    group, element = struct.unpack(endian + "HH", header[:4])
+    if (group << 16 | element) not in PIXEL_DATA_TAGS:
+        return offset
+    if implicit:
+        length = struct.unpack(endian + "I", header[4:])[0]
+    elif header[4:6] in DICOM_LONG_VRS:
+        length = struct.unpack(endian + "I", fp.read(4))[0]
+    else:
+        length = struct.unpack(endian + "H", header[6:])[0]
+    if length != 0xFFFFFFFF:
+        return fp.tell() + length
+
+    # Encapsulated: skip fragment items up to the sequence delimiter
+    while True:
+        item = fp.read(8)
+        if len(item) < 8:
+            raise ValueError("Truncated encapsulated pixel data")
+        group, element, length = struct.unpack(endian + "HHI", item)
+        if (group, element) == (0xFFFE, 0xE0DD):
+            return fp.tell()
+        fp.seek(length, os.SEEK_CUR)
+
+def _redact_dicom_instance(path: str, filename: str, profile: DicomProfile, output_path: str) -> Dict:
+    """
+    Parses, redacts and writes one instance; runs in a worker thread. The Pixel Data
+    element is the only part never parsed: the redacted header is written, the pixel
+    element is copied byte for byte, then any elements after it (private blocks,
+    signatures, padding) are read, redacted with the same profile and written, so
+    multi-hundred-MB enhanced multi-frame objects redact in flat memory.
+    """
+    with open(path, "rb") as fp:
+        ds = pydicom.dcmread(fp, stop_before_pixels=True, defer_size=DICOM_DEFER_SIZE)
+        pixel_offset = fp.tell()    # the reader stops right before the pixel data element
+        implicit, little = ds.original_encoding
+        if ds.file_meta.get("TransferSyntaxUID") == pydicom.uid.DeflatedExplicitVRLittleEndian:
+            # Deflated data sets are compressed as a whole, there is no raw pixel element to copy
+            ds = pydicom.dcmread(path, defer_size=DICOM_DEFER_SIZE)
+            pixel_offset = None
+        else:
+            pixel_end = _pixel_data_end(fp, pixel_offset, implicit, little)
+            fp.seek(pixel_end)
+            encoding = ds.get("SpecificCharacterSet", "iso8859")
+            for tag, elem in pydicom.filereader.read_dataset(fp, implicit, little, parent_encoding=encoding).items():
+                ds[tag] = elem
+
+    # Extract metadata (before redaction)
+    metadata = _dicom_metadata(ds)
+    # UIDs for grouping are the originals: the series stays recognisable to the uploader
+    study_uid, series_uid = str(ds.get("StudyInstanceUID", "unknown")), str(ds.get("SeriesInstanceUID", "unknown"))
+    burned_in = str(ds.get("BurnedInAnnotation", ""))
+
+    deidentified = profile.apply(ds)
+    if pixel_offset is None:
         ds.save_as(output_path)
-        output_files.append(output_path)
+    else:
+        tail = pydicom.Dataset()
+        for tag in [tag for tag in ds.keys() if tag > 0x7FE00010]:
+            tail[tag] = ds.get_item(tag)
+            del ds[tag]
+        ds.save_as(output_path)     # same transfer syntax, so the raw pixel element still matches
+        with open(path, "rb") as src, open(output_path, "ab") as dst:
+            src.seek(pixel_offset)
+            remaining = pixel_end - pixel_offset
+            while remaining > 0:
+                chunk = src.read(min(UPLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+            if len(tail):
+                out = pydicom.filebase.DicomFileLike(dst)
+                out.is_implicit_VR, out.is_little_endian = implicit, little
+                pydicom.filewriter.write_dataset(out, tail, ds.get("SpecificCharacterSet", "iso8859"))
 
-        # Collect redacted text for audit/classification
-        pii_text = " ".join([str(ds.get(tag, "")) for tag in tags_to_redact])
-        classification = classify_document(pii_text)
-        audit_info = await audit_file(pii_text, file.filename, user, background_tasks)
+    return {
+        "filename": filename,
+        "study_uid": study_uid,
+        "series_uid": series_uid,
+        "deidentified_series_uid": str(ds.get("SeriesInstanceUID", "")),
+        "modality": str(ds.get("Modality", "")),
+        "burned_in": burned_in,
+        "instance_number": int(ds.get("InstanceNumber") or 0),
+        "metadata": metadata,
+        "actions": deidentified["counts"],
+        # Replacement values, for audit/classification
+        "pii_text": " ".join(deidentified["replaced"])
+    }
 
-        results.append({
-            "filename": file.filename,
-            "metadata": metadata,
-            "message": f"Redacted {tags_to_redact}",
+# ---------- DICOM Burned-in Pixel Redaction ----------
+DICOM_PIXEL_REDACTION = os.getenv("DICOM_PIXEL_REDACTION", "off")   # off | auto | template | ocr
+DICOM_PIXEL_REDACTION_METHODS = ("off", "auto", "template", "ocr")
+# Modalities that commonly carry burned-in demographics
+DICOM_BURNED_IN_MODALITIES = {"US", "SC", "XC", "OT", "ES", "GM", "SM"}
+# Known annotation regions per modality, as (x0, y0, x1, y1) fractions of the frame
+DICOM_BURNED_IN_TEMPLATES = json.loads(os.getenv("DICOM_BURNED_IN_TEMPLATES", "null")) or {
+    "US": [[0.0, 0.0, 1.0, 0.08]],     # patient/institution banner along the top
+}
+DICOM_BURNED_IN_PAD = int(os.getenv("DICOM_BURNED_IN_PAD", "2"))     # pixels around each OCR word
+DICOM_OCR_FRAME_WINDOW = int(os.getenv("DICOM_OCR_FRAME_WINDOW", str(OCR_MAX_WORKERS * 2)))
+
+def _dicom_pixel_view(path: str):
+    """
+    Memory-maps the native pixel data of a written instance as (frames, rows, cols[, samples]),
+    so frames are only paged in when touched. Encapsulated (compressed) pixel data is
+    decompressed to Explicit VR Little Endian first. Returns (view, header dataset); raises
+    ValueError when the pixels cannot be viewed, since they cannot be masked either.
+    """
+    with open(path, "rb") as fp:
+        ds = pydicom.dcmread(fp, stop_before_pixels=True)
+        pixel_offset = fp.tell()
+        fp.seek(pixel_offset)
+        element = fp.read(12)
+    syntax = ds.file_meta.TransferSyntaxUID
+    if len(element) < 8 or element[:4] != b"\xe0\x7f\x10\x00":
+        if not syntax.is_little_endian:
+            raise ValueError(f"Big endian pixel data ({syntax.name}) is not supported")
+        raise ValueError("No Pixel Data element")
+    if syntax.is_encapsulated:
+        full = pydicom.dcmread(path)
+        full.decompress()
+        full.save_as(path)
+        return _dicom_pixel_view(path)
+    if ds.get("BitsAllocated") not in (8, 16, 32):
+        raise ValueError(f"BitsAllocated {ds.get('BitsAllocated')} is not supported")
+
+    header = 8 if syntax.is_implicit_VR else 12
+    frames, rows, cols = int(ds.get("NumberOfFrames") or 1), ds.Rows, ds.Columns
+    samples = int(ds.get("SamplesPerPixel") or 1)
+    dtype = np.dtype(f"{'i' if ds.get('PixelRepresentation') else 'u'}{ds.BitsAllocated // 8}").newbyteorder("<")
+    if samples == 1:
+        shape = (frames, rows, cols)
+    elif ds.get("PlanarConfiguration"):
+        shape = (frames, samples, rows, cols)
+    else:
+        shape = (frames, rows, cols, samples)
+    pixels = np.memmap(path, dtype=dtype, mode="r+", offset=pixel_offset + header, shape=shape)
+    if samples > 1 and ds.get("PlanarConfiguration"):
+        pixels = pixels.transpose(0, 2, 3, 1)   # same memory, (frames, rows, cols, samples) view
+    return pixels, ds
+
+def _burned_in_fill(ds) -> int:
+    # Black in the image's own terms: MONOCHROME1 is inverted
+    if ds.get("PhotometricInterpretation") == "MONOCHROME1":
+        return (1 << int(ds.get("BitsStored") or ds.BitsAllocated)) - 1
+    return 0
+
+def _ocr_frame_boxes(frame: np.ndarray, invert: bool) -> Tuple[List[Tuple[int, int, int, int]], float]:
+    """Worker side: windows one frame to 8 bits, OCRs it and returns (word boxes, seconds)."""
+    started = time.perf_counter()
+    lo, hi = float(frame.min()), float(frame.max())
+    image = ((frame.astype(np.float32) - lo) * (255.0 / ((hi - lo) or 1.0))).astype(np.uint8)
+    if invert:
+        image = 255 - image
+    words = _ocr_data_words(cached_ocr(image, "data"))
+    boxes = [tuple(int(v) for v in box) for _, box, _ in words]
+    return boxes, time.perf_counter() - started
+
+def _pixel_method(method: str, modality: str, burned_in: str) -> str:
+    """
+    Resolves "auto" per instance; returns "off", "template" or "ocr". A template request
+    for a modality without a template falls back to OCR rather than masking nothing.
+    """
+    if method == "auto" and burned_in != "YES" and modality not in DICOM_BURNED_IN_MODALITIES:
+        return "off"
+    if method in ("auto", "template"):
+        return "template" if modality in DICOM_BURNED_IN_TEMPLATES else "ocr"
+    return method
+
+async def redact_burned_in(path: str, modality: str, method: str) -> Dict:
+    """
+    Masks burned-in text in the pixel data of a written instance, in place. Template
+    regions are blanked with one slice across all frames; OCR runs per frame on the
+    shared OCR executor, and frames with the same word boxes share one mask applied
+    across all of them at once.
+    """
+    pixels, ds = await asyncio.to_thread(_dicom_pixel_view, path)
+    fill = _burned_in_fill(ds)
+    frames, rows, cols = pixels.shape[:3]
+    frame_timings = []
+
+    if method == "template":
+        boxes = [
+            (int(x0 * cols), int(y0 * rows), math.ceil(x1 * cols), math.ceil(y1 * rows))
+            for x0, y0, x1, y1 in DICOM_BURNED_IN_TEMPLATES[modality]
+        ]
+        started = time.perf_counter()
+        for x0, y0, x1, y1 in boxes:
+            pixels[:, y0:y1, x0:x1] = fill
+        regions = len(boxes) * frames
+    else:
+        ocr_executor.admit()
+        invert = ds.get("PhotometricInterpretation") == "MONOCHROME1"
+        frame_boxes = []
+        # Bounded windows: only a few decoded frames are in flight at any time
+        for start in range(0, frames, DICOM_OCR_FRAME_WINDOW):
+            window = range(start, min(start + DICOM_OCR_FRAME_WINDOW, frames))
+            results = await asyncio.gather(*(
+                ocr_executor.run(_ocr_frame_boxes, np.array(pixels[i]), invert) for i in window
+            ))
+            for i, (boxes, seconds) in zip(window, results):
+                frame_boxes.append(boxes)
+                frame_timings.append({"frame": i, "ocr_seconds": round(seconds, 4), "regions": len(boxes)})
+
+        started = time.perf_counter()
+        groups = {}
+        for i, boxes in enumerate(frame_boxes):
+            if boxes:
+                padded = tuple(sorted(
+                    (x0 - DICOM_BURNED_IN_PAD, y0 - DICOM_BURNED_IN_PAD, x1 + DICOM_BURNED_IN_PAD, y1 + DICOM_BURNED_IN_PAD)
+                    for x0, y0, x1, y1 in boxes
+                ))
+                groups.setdefault(padded, []).append(i)
+        for boxes, frame_indices in groups.items():
+            rr, cc = np.nonzero(box_mask((rows, cols), boxes))
+            pixels[np.asarray(frame_indices)[:, None], rr[None, :], cc[None, :]] = fill
+        regions = sum(len(boxes) for boxes in frame_boxes)
+
+    pixels.flush()
+    return {
+        "method": method,
+        "frames": frames,
+        "regions": regions,
+        "mask_seconds": round(time.perf_counter() - started, 4),
+        "frame_timings": frame_timings
+    }
+
+async def process_dicom_series(
+    instances: List[Tuple[str, str]],
+    privacy_mode: str,
+    user: str,
+    background_tasks: BackgroundTasks,
+    pixel_redaction: str = DICOM_PIXEL_REDACTION
+) -> Dict:
+    """
+    Series pipeline for (path, filename) instances: every instance is parsed and
+    redacted exactly once, DICOM_WORKERS at a time in threads, then grouped by
+    Study/Series Instance UID. Classification and auditing run once per series.
+    pixel_redaction adds the burned-in text stage (see redact_burned_in).
+    """
+    profile = dicom_profile(privacy_mode)
+    limit = asyncio.Semaphore(DICOM_WORKERS)
+
+    async def redact_one(path: str, filename: str):
+        output_name, output_path = redacted_output(filename)
+        async with limit:
+            try:
+                item = await asyncio.to_thread(_redact_dicom_instance, path, filename, profile, output_path)
+            except Exception as e:
+                # Not DICOM (or corrupt): fail this instance, not the series
+                return {"filename": filename, "error": str(e)}
+
+        item["pixel_redaction"] = None
+        method = _pixel_method(pixel_redaction, item["modality"], item["burned_in"])
+        if method != "off":
+            try:
+                item["pixel_redaction"] = await redact_burned_in(output_path, item["modality"], method)
+            except Exception as e:
+                # Never hand out an instance whose burned-in text may still be there
+                os.remove(output_path)
+                return {"filename": filename, "error": f"Pixel redaction failed: {e}"}
+        item["output_name"] = output_name
+        return item
+
+    redacted = await asyncio.gather(*(redact_one(path, filename) for path, filename in instances))
+
+    series = {}
+    errors = []
+    for item in redacted:
+        if "error" in item:
+            errors.append(item)
+        else:
+            series.setdefault((item["study_uid"], item["series_uid"]), []).append(item)
+
+    series_results = []
+    results = []
+    for (study_uid, series_uid), items in series.items():
+        items.sort(key=lambda item: item["instance_number"])
+        pii_text = "\n".join(item["pii_text"] for item in items)
+        classification = classify_document(pii_text)
+        # The audit row and ledger block can't be scrubbed later: log the keyed UID, never the original
+        audit_info = await audit_file(pii_text, remap_uid(series_uid), user, background_tasks)
+
+        series_results.append({
+            "study_uid": study_uid,
+            "series_uid": series_uid,
+            "deidentified_series_uid": items[0]["deidentified_series_uid"],
+            "modality": items[0]["modality"],
+            "instance_count": len(items),
+            "instances": [item["filename"] for item in items],
             "compliance": audit_info,
-            "privacy_mode": privacy_mode,
-            "classification": classification,
-            "download_url": f"/download/{file.filename}"
+            "classification": classification
         })
+        for item in items:
+            results.append({
+                "filename": item["filename"],
+                "study_uid": study_uid,
+                "series_uid": series_uid,
+                "metadata": item["metadata"],
+                "message": f"De-identified with the {profile.mode} profile",
+                "actions": item["actions"],
+                "pixel_redaction": item["pixel_redaction"],
+                "compliance": audit_info,
+                "privacy_mode": privacy_mode,
+                "classification": classification,
+                "download_url": f"/download/{item['output_name']}"
+            })
+
+    return {"series": series_results, "results": results, "errors": errors}
 
-    return {"results": results}
+@app.post("/process/dicom")
+async def process_dicom(
+    files: List[UploadFile] = File(...),
+    user: str = "admin",
+    background_tasks: BackgroundTasks = None,
+    privacy_mode: str = "research",
+    pixel_redaction: str = None
+):
+    method = pixel_redaction or DICOM_PIXEL_REDACTION
+    if method not in DICOM_PIXEL_REDACTION_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown pixel_redaction {method}, expected one of {DICOM_PIXEL_REDACTION_METHODS}")
+
+    instances = [((await spool_upload(file, ".dcm"))[0], file.filename) for file in files]
+    try:
+        return await process_dicom_series(instances, privacy_mode, user, background_tasks, pixel_redaction=method)
+    finally:
+        for path, _ in instances:
+            os.remove(path)
 
 # ---------- Word Documents (Clinical Notes, Emails) ----------
 @app.post("/process/word")
@@ -670,6 +3063,16 @@ async def process_word(
     privacy_mode: str = "research"
 ):
     contents = await file.read()
+
+    # Same bytes + mode already processed → skip straight to audit logging
+    cache_key = result_cache.key(hashlib.sha256(contents).hexdigest(), "word", privacy_mode)
+    cached = result_cache.get(cache_key)
+    if cached:
+        result = dict(cached["result"], filename=file.filename, cache="hit")
+        audits = await replay_audits(cached, file.filename, user, background_tasks)
+        result["results"] = [dict(page, compliance=audit) for page, audit in zip(result["results"], audits)]
+        return result
+
     doc = Document(io.BytesIO(contents))
 
     # Extract text page-wise (simulate multi-page by section breaks or paragraphs)
@@ -690,13 +3093,15 @@ async def process_word(
     if not pages:
         pages = ["\n".join([p.text for p in doc.paragraphs])]
 
-    # Process each page
+    # Process each page (redaction batched across all pages)
+    redacted_pages = await redaction_batcher.redact(pages, mode=privacy_mode)
     results = []
-    for i, page_text in enumerate(pages, start=1):
-        redacted = redact_text(page_text, mode=privacy_mode)
+    audits = []
+    for i, (page_text, (redacted, _)) in enumerate(zip(pages, redacted_pages), start=1):
         classification = classify_document(page_text)
         audit_info = await audit_file(page_text, f"{file.filename}_page_{i}", user, background_tasks)
-        
+        audits.append(audit_record(audit_info, f"_page_{i}"))
+
         results.append({
             "page": i,
             "original": page_text[:500],
@@ -706,11 +3111,21 @@ async def process_word(
             "classification": classification
         })
 
-    return {
+    result = {
         "filename": file.filename,
         "total_pages": len(pages),
         "results": results
     }
+    result_cache.put(
+        cache_key,
+        {
+            "result": dict(result, results=[dict(page, compliance=None) for page in results]),
+            "audits": audits,
+            "spans": [spans for _, spans in redacted_pages]
+        },
+        text="\n".join(pages)
+    )
+    return dict(result, cache="miss")
 
 # ---------- Excel/CSV (Lab Results) ----------
 @app.post("/process/sheet")
@@ -722,36 +3137,68 @@ async def process_sheet(
 ):
     contents = await file.read()
 
-    text_blocks = []
+    # Same bytes + mode already processed → skip straight to audit logging
+    cache_key = result_cache.key(hashlib.sha256(contents).hexdigest(), "sheet", privacy_mode)
+    cached = result_cache.get(cache_key)
+    if cached:
+        result = dict(cached["result"], cache="hit")
+        result["compliance"] = (await replay_audits(cached, file.filename, user, background_tasks))[0]
+        return result
+
+    sheets = []
     try:
         # Try reading as Excel with multiple sheets
         xls = pd.ExcelFile(io.BytesIO(contents))
         for sheet_name in xls.sheet_names:
-            df = xls.parse(sheet_name)
-            text_blocks.append(f"--- Sheet: {sheet_name} ---\n{df.to_string(index=False)}")
+            sheets.append((f"--- Sheet: {sheet_name} ---", xls.parse(sheet_name)))
     except Exception:
         # If not Excel, fallback to CSV
         try:
-            df = pd.read_csv(io.BytesIO(contents))
-            text_blocks.append(f"--- CSV File ---\n{df.to_string(index=False)}")
+            sheets.append(("--- CSV File ---", pd.read_csv(io.BytesIO(contents))))
         except Exception as e:
             return {"error": f"Unable to parse file: {str(e)}"}
 
-    full_text = "\n\n".join(text_blocks)
-
-    # Apply redaction and classification
-    redacted = redact_text(full_text, mode=privacy_mode)
+    full_text = "\n\n".join(f"{title}\n{df.to_string(index=False)}" for title, df in sheets)
+
+    # Titles, headers and cells of every sheet are redacted in one batched run,
+    # keyed by (sheet, row, column); row None is the header, column None the title
+    batch = RedactionBatch(mode=privacy_mode)
+    for i, (title, df) in enumerate(sheets):
+        batch.add((i, None, None), title)
+        for col, column in enumerate(df.columns):
+            batch.add((i, None, col), str(column))
+            for row, value in enumerate(df[column]):
+                if pd.notna(value):
+                    batch.add((i, row, col), str(value))
+    cells = await batch.run()
+
+    redacted_frames = [df.astype(object) for _, df in sheets]
+    for (i, row, col), text in cells.items():
+        if row is not None and batch.spans[(i, row, col)]:
+            redacted_frames[i].iat[row, col] = text
+    text_blocks = []
+    for i, redacted_df in enumerate(redacted_frames):
+        redacted_df.columns = [cells[(i, None, col)] for col in range(len(redacted_df.columns))]
+        text_blocks.append(f"{cells[(i, None, None)]}\n{redacted_df.to_string(index=False)}")
+    redacted = "\n\n".join(text_blocks)
+    spans = [[list(key), table] for key, table in batch.spans.items() if table]
     classification = classify_document(full_text)
     audit_info = await audit_file(full_text, file.filename, user, background_tasks)
 
-    return {
+    result = {
         "original": full_text[:1000],   # send preview only
         "redacted": redacted[:1000],
-        "compliance": audit_info,
+        "compliance": None,
         "privacy_mode": privacy_mode,
         "classification": classification,
         "sheets": len(text_blocks)      # number of sheets processed
     }
+    result_cache.put(
+        cache_key,
+        {"result": result, "audits": [audit_record(audit_info)], "spans": spans},
+        text=full_text
+    )
+    return dict(result, compliance=audit_info, cache="miss")
 
 # ---------- HL7/FHIR Structured JSON ----------
 @app.post("/process/hl7")
@@ -762,98 +3209,588 @@ async def process_hl7(
     privacy_mode: str = "research"
 ):
     contents = await file.read()
-    data = json.loads(contents)
 
-    def recursive_redact(d):
-        if isinstance(d, dict):
-            return {k: recursive_redact(v) for k, v in d.items()}
-        elif isinstance(d, list):
-            return [recursive_redact(i) for i in d]
-        elif isinstance(d, str):
-            return redact_text(d, mode=privacy_mode)
-        else:
-            return d
+    # Same bytes + mode already processed → skip straight to audit logging
+    cache_key = result_cache.key(hashlib.sha256(contents).hexdigest(), "hl7", privacy_mode)
+    cached = result_cache.get(cache_key)
+    if cached:
+        result = dict(cached["result"], cache="hit")
+        result["compliance"] = (await replay_audits(cached, file.filename, user, background_tasks))[0]
+        return result
 
-    redacted = recursive_redact(data)
-    classification = classify_document(json.dumps(data))
-    audit_info = await audit_file(json.dumps(data), file.filename, user, background_tasks)
+    data = json.loads(contents)
+
+    # Redact every string leaf in one batched pipeline run
+    batch = RedactionBatch(mode=privacy_mode)
+    batch.add_json(data)
+    redacted = rebuild_json(data, await batch.run())
+    full_text = json.dumps(data)
+    classification = classify_document(full_text)
+    audit_info = await audit_file(full_text, file.filename, user, background_tasks)
 
     # Convert dicts → string for preview
     data_str = json.dumps(data, indent=2)
     redacted_str = json.dumps(redacted, indent=2)
 
-    return {
+    result = {
         "original": data_str[:500],      # ✅ safe preview
         "redacted": redacted_str[:500],  # ✅ safe preview
-        "compliance": audit_info,
+        "compliance": None,
         "privacy_mode": privacy_mode,
         "classification": classification
     }
+    # Span tables keyed by JSON path (only leaves that had something redacted)
+    spans = [[list(path), table] for path, table in batch.spans.items() if table]
+    result_cache.put(
+        cache_key,
+        {"result": result, "audits": [audit_record(audit_info)], "spans": spans},
+        text=full_text
+    )
+    return dict(result, compliance=audit_info, cache="miss")
+
+# ---------- Batch Progress Store ----------
+PROGRESS_BACKEND = os.getenv("PROGRESS_BACKEND", "sqlite")     # "sqlite" (shared by workers) or "memory"
+PROGRESS_DB_PATH = os.getenv("PROGRESS_DB_PATH", os.path.join(tempfile.gettempdir(), "medvault_cache", "progress.db"))
+PROGRESS_RESULTS_DIR = os.getenv("PROGRESS_RESULTS_DIR", os.path.join(tempfile.gettempdir(), "medvault_cache", "batches"))
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", str(24 * 3600)))
+PROGRESS_MAX_BATCHES = int(os.getenv("PROGRESS_MAX_BATCHES", "1000"))
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "0.5"))
+
+class ProgressStore(ABC):
+    """
+    Batch progress kept as a compact summary (counts, per-file state, errors) plus a
+    numbered event log. Full per-file results are appended to an NDJSON file on disk
+    and located through byte offsets kept in the summary. Batches expire PROGRESS_TTL
+    after their last update; past max_batches the least recently updated finished
+    ones are dropped. Subclasses provide where summaries and events live.
+    """
+    def __init__(self, results_dir: str, ttl: int, max_batches: int):
+        self.results_dir = results_dir
+        self.ttl = ttl
+        self.max_batches = max_batches
+        os.makedirs(results_dir, exist_ok=True)
+
+    # Backend hooks
+    @abstractmethod
+    def _load(self, batch_id: str):
+        ...
+
+    @abstractmethod
+    def _save(self, batch_id: str, summary: Dict):
+        ...
+
+    @abstractmethod
+    def _delete(self, batch_id: str):
+        ...
+
+    @abstractmethod
+    def _batches(self) -> List[Tuple[str, str, float]]:
+        """(batch_id, status, updated) for every stored batch."""
+
+    @abstractmethod
+    def append_event(self, batch_id: str, event: str, data: Dict) -> int:
+        ...
+
+    @abstractmethod
+    def events(self, batch_id: str, after: int = -1) -> List[Dict]:
+        ...
+
+    def update(self, batch_id: str, change):
+        """Applies change(summary) and stores the result."""
+        summary = self._load(batch_id)
+        change(summary)
+        summary["updated"] = time.time()
+        self._save(batch_id, summary)
+        return summary
+
+    # Shared logic
+    def _results_path(self, batch_id: str) -> str:
+        return os.path.join(self.results_dir, f"{batch_id}.ndjson")
+
+    def create(self, batch_id: str, filenames: List[str]):
+        self.evict()
+        now = time.time()
+        self._save(batch_id, {
+            "total": len(filenames),
+            "processed": 0,
+            "failed": 0,
+            "status": "queued",
+            "files": {name: "queued" for name in filenames},
+            "errors": [],
+            "offsets": [],
+            "created": now,
+            "updated": now
+        })
+
+    def get(self, batch_id: str):
+        summary = self._load(batch_id)
+        if summary is not None and time.time() - summary["updated"] > self.ttl:
+            self.delete(batch_id)
+            return None
+        return summary
+
+    def add_result(self, batch_id: str, filename: str, result: Dict) -> int:
+        """Appends a full result to the batch's NDJSON file; returns its index."""
+        with open(self._results_path(batch_id), "a", encoding="utf-8") as f:
+            offset = f.tell()
+            f.write(json.dumps({filename: result}, default=str) + "\n")
+        summary = self.update(batch_id, lambda s: s["offsets"].append(offset))
+        return len(summary["offsets"]) - 1
+
+    def results(self, batch_id: str, cursor: int = 0, summary: Dict = None) -> List[Dict]:
+        offsets = (summary or self._load(batch_id))["offsets"]
+        if cursor >= len(offsets):
+            return []
+        with open(self._results_path(batch_id), encoding="utf-8") as f:
+            f.seek(offsets[cursor])
+            return [json.loads(f.readline()) for _ in range(len(offsets) - cursor)]
+
+    def result(self, batch_id: str, index: int) -> Dict:
+        offsets = self._load(batch_id)["offsets"]
+        with open(self._results_path(batch_id), encoding="utf-8") as f:
+            f.seek(offsets[index])
+            return json.loads(f.readline())
+
+    def delete(self, batch_id: str):
+        self._delete(batch_id)
+        if os.path.exists(self._results_path(batch_id)):
+            os.remove(self._results_path(batch_id))
+
+    def evict(self):
+        now = time.time()
+        live = []
+        for batch_id, status, updated in self._batches():
+            if now - updated > self.ttl:
+                self.delete(batch_id)
+            else:
+                live.append((updated, batch_id, status))
+
+        excess = len(live) - self.max_batches
+        for _, batch_id, status in sorted(live):
+            if excess <= 0:
+                break
+            if status == "done":     # never drop a batch that is still running
+                self.delete(batch_id)
+                excess -= 1
+
+class MemoryProgressStore(ProgressStore):
+    """Single-process backend: summaries and events in dicts (results still go to disk)."""
+    def __init__(self, results_dir: str, ttl: int, max_batches: int):
+        super().__init__(results_dir, ttl, max_batches)
+        self._summaries = {}
+        self._events = {}
+
+    def _load(self, batch_id: str):
+        return self._summaries.get(batch_id)
+
+    def _save(self, batch_id: str, summary: Dict):
+        self._summaries[batch_id] = summary
+
+    def _delete(self, batch_id: str):
+        self._summaries.pop(batch_id, None)
+        self._events.pop(batch_id, None)
+
+    def _batches(self) -> List[Tuple[str, str, float]]:
+        return [(batch_id, s["status"], s["updated"]) for batch_id, s in list(self._summaries.items())]
+
+    def append_event(self, batch_id: str, event: str, data: Dict) -> int:
+        events = self._events.setdefault(batch_id, [])
+        events.append({"id": len(events), "event": event, "data": data})
+        return len(events) - 1
+
+    def events(self, batch_id: str, after: int = -1) -> List[Dict]:
+        return self._events.get(batch_id, [])[after + 1:]
+
+class SqliteProgressStore(ProgressStore):
+    """
+    Backend shared by every uvicorn worker on the host: summaries and events live in
+    an SQLite database (WAL), so any worker can answer progress polls and SSE streams.
+    """
+    def __init__(self, path: str, results_dir: str, ttl: int, max_batches: int):
+        super().__init__(results_dir, ttl, max_batches)
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per process: uvicorn workers fork after import
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "batch_id TEXT PRIMARY KEY, status TEXT NOT NULL, updated REAL NOT NULL, summary TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS batch_events ("
+                "batch_id TEXT NOT NULL, id INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (batch_id, id))"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _load(self, batch_id: str):
+        row = self._connect().execute("SELECT summary FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, batch_id: str, summary: Dict):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?)",
+            (batch_id, summary["status"], summary["updated"], json.dumps(summary))
+        )
+
+    def update(self, batch_id: str, change):
+        # Read-modify-write under a write lock so concurrent writers cannot interleave
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            summary = super().update(batch_id, change)
+            conn.execute("COMMIT")
+            return summary
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _delete(self, batch_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM batches WHERE batch_id = ?", (batch_id,))
+            conn.execute("DELETE FROM batch_events WHERE batch_id = ?", (batch_id,))
+
+    def _batches(self) -> List[Tuple[str, str, float]]:
+        return self._connect().execute("SELECT batch_id, status, updated FROM batches").fetchall()
+
+    def append_event(self, batch_id: str, event: str, data: Dict) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            next_id = conn.execute(
+                "SELECT COALESCE(MAX(id) + 1, 0) FROM batch_events WHERE batch_id = ?", (batch_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO batch_events VALUES (?, ?, ?, ?)",
+                (batch_id, next_id, event, json.dumps(data, default=str))
+            )
+            conn.execute("COMMIT")
+            return next_id
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def events(self, batch_id: str, after: int = -1) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT id, event, data FROM batch_events WHERE batch_id = ? AND id > ? ORDER BY id",
+            (batch_id, after)
+        ).fetchall()
+        return [{"id": i, "event": event, "data": json.loads(data)} for i, event, data in rows]
+
+if PROGRESS_BACKEND == "memory":
+    progress_store = MemoryProgressStore(PROGRESS_RESULTS_DIR, PROGRESS_TTL, PROGRESS_MAX_BATCHES)
+else:
+    progress_store = SqliteProgressStore(PROGRESS_DB_PATH, PROGRESS_RESULTS_DIR, PROGRESS_TTL, PROGRESS_MAX_BATCHES)
 
 # ---------- Upload any number and type of documents ----------
+# Per-type concurrency: OCR-heavy files are bounded by the OCR pool, cheap
+# structured files (JSON/HL7, sheets, Word) can run many at once
+UPLOAD_CONCURRENCY = {
+    "ocr": int(os.getenv("UPLOAD_OCR_CONCURRENCY", str(OCR_MAX_WORKERS))),
+    "dicom": int(os.getenv("UPLOAD_DICOM_CONCURRENCY", "4")),
+    "text": int(os.getenv("UPLOAD_TEXT_CONCURRENCY", "8")),
+}
+UPLOAD_OCR_RETRY_SECONDS = float(os.getenv("UPLOAD_OCR_RETRY_SECONDS", "2"))
+UPLOAD_OCR_MAX_RETRIES = int(os.getenv("UPLOAD_OCR_MAX_RETRIES", "30"))
+UPLOAD_EVENTS_KEEPALIVE = float(os.getenv("UPLOAD_EVENTS_KEEPALIVE", "15"))
+
+def _upload_handler(suffix: str):
+    """Maps a file suffix to (concurrency class, processing coroutine)."""
+    if suffix == ".pdf":
+        return "ocr", process_pdf
+    if suffix in [".jpg", ".jpeg", ".png", ".tiff"]:
+        return "ocr", process_image
+    if suffix in [".docx", ".doc"]:
+        return "text", process_word
+    if suffix in [".xlsx", ".xls", ".csv"]:
+        return "text", process_sheet
+    if suffix in [".json", ".hl7"]:
+        return "text", process_hl7
+    return None, None
+
+class UploadScheduler:
+    """
+    Runs queued upload batches in the background. Every file becomes its own job,
+    gated by the semaphore of its concurrency class; progress, partial results and
+    failures land in progress_store as each job finishes.
+    """
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = limits
+        self._semaphores = None
+        self._tasks = set()
+        self._wakeups = {}
+
+    def emit(self, batch_id: str, event: str, data: Dict):
+        """Appends a numbered event to the batch log and wakes up local streaming clients."""
+        progress_store.append_event(batch_id, event, data)
+        wakeup = self._wakeups.pop(batch_id, None)
+        if wakeup:
+            wakeup.set()
+
+    def wakeup(self, batch_id: str) -> asyncio.Event:
+        """Event set by the next emit for this batch. Grab it before reading the log so nothing is missed."""
+        return self._wakeups.setdefault(batch_id, asyncio.Event())
+
+    def _semaphore(self, kind: str) -> asyncio.Semaphore:
+        # Created lazily so they bind to the running event loop
+        if self._semaphores is None:
+            self._semaphores = {k: asyncio.Semaphore(n) for k, n in self.limits.items()}
+        return self._semaphores[kind]
+
+    def enqueue(self, batch_id: str, jobs: List[Dict], privacy_mode: str, user: str):
+        task = asyncio.create_task(self._run_batch(batch_id, jobs, privacy_mode, user))
+        self._tasks.add(task)   # keep a reference until done, or it may be GC'd mid-run
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch_id: str, jobs: List[Dict], privacy_mode: str, user: str):
+        progress_store.update(batch_id, lambda s: s.update(status="running"))
+        started = time.perf_counter()
+        # DICOM instances go through the series pipeline together, everything else file by file
+        dicom_jobs = [job for job in jobs if job["suffix"] == ".dcm"]
+        await asyncio.gather(
+            *(self._run_job(batch_id, job, privacy_mode, user) for job in jobs if job["suffix"] != ".dcm"),
+            *([self._run_dicom_jobs(batch_id, dicom_jobs, privacy_mode, user)] if dicom_jobs else [])
+        )
+        # batch_complete goes into the log before the status flips, so a stream in
+        # another worker that sees "done" has the event to send as well
+        summary = progress_store.get(batch_id)
+        self.emit(batch_id, "batch_complete", {
+            "processed": summary["processed"],
+            "failed": summary["failed"],
+            "total": summary["total"],
+            "seconds": round(time.perf_counter() - started, 4)
+        })
+        progress_store.update(batch_id, lambda s: s.update(status="done"))
+
+    async def _run_job(self, batch_id: str, job: Dict, privacy_mode: str, user: str):
+        filename = job["filename"]
+        kind, handler = _upload_handler(job["suffix"])
+        timings = {}
+        queued = time.perf_counter()
+        try:
+            if handler is None:
+                raise HTTPException(status_code=415, detail=f"Unsupported file type: {job['suffix']}")
+            async with self._semaphore(kind):
+                timings["queued"] = round(time.perf_counter() - queued, 4)
+                progress_store.update(batch_id, lambda s: s["files"].__setitem__(filename, "running"))
+                self.emit(batch_id, "file_started", {"filename": filename, "kind": kind, "timings": dict(timings)})
+                result = await self._process(job, handler, privacy_mode, user, timings)
+
+            index = progress_store.add_result(batch_id, filename, result)
+
+            def finished(s):
+                s["files"][filename] = "done"
+                s["processed"] += 1
+            progress_store.update(batch_id, finished)
+            # Results are not duplicated into the event log; streams read them back by index
+            self.emit(batch_id, "file_finished", {"filename": filename, "timings": timings, "result_index": index})
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            progress_store.add_result(batch_id, filename, {"error": detail})
+
+            def failed(s):
+                s["errors"].append({"filename": filename, "error": detail})
+                s["files"][filename] = "failed"
+                s["failed"] += 1
+                s["processed"] += 1
+            progress_store.update(batch_id, failed)
+            self.emit(batch_id, "file_failed", {"filename": filename, "timings": timings, "error": detail})
+        finally:
+            if os.path.exists(job["path"]):
+                os.remove(job["path"])
+
+    async def _run_dicom_jobs(self, batch_id: str, jobs: List[Dict], privacy_mode: str, user: str):
+        timings = {}
+        queued = time.perf_counter()
+        try:
+            async with self._semaphore("dicom"):
+                timings["queued"] = round(time.perf_counter() - queued, 4)
+
+                def running(s):
+                    for job in jobs:
+                        s["files"][job["filename"]] = "running"
+                progress_store.update(batch_id, running)
+                self.emit(batch_id, "file_started", {
+                    "filenames": [job["filename"] for job in jobs], "kind": "dicom", "timings": dict(timings)
+                })
+
+                tasks = BackgroundTasks()
+                started = time.perf_counter()
+                output = await process_dicom_series(
+                    [(job["path"], job["filename"]) for job in jobs], privacy_mode, user, tasks
+                )
+                timings["process"] = round(time.perf_counter() - started, 4)
+                started = time.perf_counter()
+                await tasks()
+                timings["notify"] = round(time.perf_counter() - started, 4)
+        except Exception as e:
+            output = {"series": [], "results": [], "errors": [{"filename": job["filename"], "error": str(e)} for job in jobs]}
+        finally:
+            for job in jobs:
+                if os.path.exists(job["path"]):
+                    os.remove(job["path"])
+
+        for result in output["results"]:
+            index = progress_store.add_result(batch_id, result["filename"], result)
+
+            def finished(s, filename=result["filename"]):
+                s["files"][filename] = "done"
+                s["processed"] += 1
+            progress_store.update(batch_id, finished)
+            self.emit(batch_id, "file_finished", {"filename": result["filename"], "timings": timings, "result_index": index})
+
+        for error in output["errors"]:
+            progress_store.add_result(batch_id, error["filename"], {"error": error["error"]})
+
+            def failed(s, error=error):
+                s["errors"].append(error)
+                s["files"][error["filename"]] = "failed"
+                s["failed"] += 1
+                s["processed"] += 1
+            progress_store.update(batch_id, failed)
+            self.emit(batch_id, "file_failed", dict(error, timings=timings))
+
+        # Per-series summary (without the per-instance copies already sent above)
+        for series in output["series"]:
+            self.emit(batch_id, "dicom_series", series)
+
+    async def _process(self, job: Dict, handler, privacy_mode: str, user: str, timings: Dict):
+        for attempt in range(UPLOAD_OCR_MAX_RETRIES + 1):
+            # Fresh BackgroundTasks per job: there is no response to attach them to,
+            # so they (SMS alerts) run as soon as the job's result is in
+            tasks = BackgroundTasks()
+            started = time.perf_counter()
+            with open(job["path"], "rb") as f:
+                file = UploadFile(file=f, filename=job["filename"])
+                try:
+                    result = await handler(file=file, privacy_mode=privacy_mode, user=user, background_tasks=tasks)
+                except HTTPException as e:
+                    # OCR pool saturated: wait for it to drain instead of failing the file
+                    if e.status_code != 429 or attempt == UPLOAD_OCR_MAX_RETRIES:
+                        raise
+                    await asyncio.sleep(UPLOAD_OCR_RETRY_SECONDS)
+                    timings["ocr_backoff"] = round(timings.get("ocr_backoff", 0) + time.perf_counter() - started, 4)
+                    continue
+            timings["process"] = round(time.perf_counter() - started, 4)
+
+            started = time.perf_counter()
+            await tasks()
+            timings["notify"] = round(time.perf_counter() - started, 4)
+            return result
+
+    def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+upload_scheduler = UploadScheduler(UPLOAD_CONCURRENCY)
+
 @app.post("/upload")
 async def upload_files(
     files: list[UploadFile] = File(...),   # Accept multiple files
     privacy_mode: str = Form("research"),
-    user: str = Form("admin"),
-    background_tasks: BackgroundTasks = None
+    user: str = Form("admin")
 ):
     batch_id = str(uuid.uuid4())
-    progress_store[batch_id] = {"total": len(files), "processed": 0, "results": []}
-
-    results = []
 
+    # Spool everything to disk now: the UploadFile objects die with the request
+    jobs = []
     for file in files:
         suffix = os.path.splitext(file.filename)[-1].lower()
+        path, _ = await spool_upload(file, suffix)
+        jobs.append({"filename": file.filename, "suffix": suffix, "path": path})
 
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
-        try:
-            await file.seek(0)
-
-            if suffix == ".pdf":
-                result = await process_pdf(file=file, privacy_mode=privacy_mode, user=user, background_tasks=background_tasks)
-            elif suffix in [".docx", ".doc"]:
-                result = await process_word(file=file, privacy_mode=privacy_mode, user=user, background_tasks=background_tasks)
-            elif suffix in [".jpg", ".jpeg", ".png", ".tiff"]:
-                result = await process_image(file=file, privacy_mode=privacy_mode, user=user, background_tasks=background_tasks)
-            elif suffix == ".dcm":
-                result = await process_dicom(files=files, privacy_mode=privacy_mode, user=user, background_tasks=background_tasks)
-            elif suffix in [".xlsx", ".xls", ".csv"]:
-                result = await process_sheet(file=file, privacy_mode=privacy_mode, user=user, background_tasks=background_tasks)
-            elif suffix in [".json", ".hl7"]:
-                result = await process_hl7(file=file, privacy_mode=privacy_mode, user=user, background_tasks=background_tasks)
-            else:
-                result = {"error": f"Unsupported file type: {suffix}"}
+    progress_store.create(batch_id, [job["filename"] for job in jobs])
+    upload_scheduler.enqueue(batch_id, jobs, privacy_mode, user)
 
-            results.append({file.filename: result})
-
-            # Update progress
-            progress_store[batch_id]["processed"] += 1
-            progress_store[batch_id]["results"].append({file.filename: result})
-
-        finally:
-            os.remove(tmp_path)
-
-    return {"batch_id": batch_id, "results": results}
+    return {"batch_id": batch_id, "status": "queued", "total": len(jobs), "results": []}
 
 
 @app.get("/upload/progress/{batch_id}")
-async def get_batch_progress(batch_id: str):
+async def get_batch_progress(
+    batch_id: str,
+    cursor: int = Query(None, ge=0, description="Only return results after this offset (next_cursor of the last poll)")
+):
     progress = progress_store.get(batch_id)
     if not progress:
         return JSONResponse({"error": "Invalid batch_id"}, status_code=404)
 
     return {
         "batch_id": batch_id,
+        "status": progress["status"],
         "processed": progress["processed"],
+        "failed": progress["failed"],
         "total": progress["total"],
-        "results": progress["results"]
+        "files": progress["files"],
+        "results": progress_store.results(batch_id, cursor or 0, summary=progress),
+        "next_cursor": len(progress["offsets"]),
+        "errors": progress["errors"]
     }
 
+def _sse(event: Dict) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+@app.get("/upload/events/{batch_id}")
+async def stream_batch_progress(
+    batch_id: str,
+    after: int = Query(None, ge=0, description="Resume after this event id"),
+    last_event_id: str = Header(None)
+):
+    """
+    Server-sent events for a batch: file_started, file_finished (with result and
+    per-stage timings), file_failed and batch_complete. Reconnecting clients resume
+    from Last-Event-ID (or ?after=) instead of getting the whole history again.
+    """
+    if progress_store.get(batch_id) is None:
+        return JSONResponse({"error": "Invalid batch_id"}, status_code=404)
+
+    if after is None and last_event_id is not None and last_event_id.isdigit():
+        after = int(last_event_id)
+    position = -1 if after is None else after
+
+    async def event_stream():
+        nonlocal position
+        last_sent = time.monotonic()
+        while True:
+            wakeup = upload_scheduler.wakeup(batch_id)
+            progress = progress_store.get(batch_id)
+            if progress is None:
+                return
+            for event in progress_store.events(batch_id, position):
+                if event["event"] == "file_finished":
+                    data = dict(event["data"])
+                    data["result"] = progress_store.result(batch_id, data.pop("result_index"))[data["filename"]]
+                    event = dict(event, data=data)
+                yield _sse(event)
+                position = event["id"]
+                last_sent = time.monotonic()
+                if event["event"] == "batch_complete":
+                    return
+            if progress["status"] == "done":
+                return
+            # Local emits wake us right away; the poll interval covers batches
+            # running in another worker process
+            try:
+                await asyncio.wait_for(wakeup.wait(), PROGRESS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                if time.monotonic() - last_sent >= UPLOAD_EVENTS_KEEPALIVE:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ---------------- EMR (FHIR Patients) ----------------
 @app.get("/emr/patients", summary="Get patients (EMR - HAPI FHIR Sandbox)")
 async def get_patients():
@@ -940,7 +3877,8 @@ async def get_claims():
 @app.post("/audit/process")
 async def process_document(doc: Document, action: Action, background_tasks: BackgroundTasks):
     # 1. HIPAA compliance check
-    violations = check_hipaa_compliance(doc.content)
+    findings = scan_hipaa(doc.content)
+    violations = findings["violations"]
     risk = "high" if violations else "low"
 
     # 2. Async DB audit log
@@ -962,6 +3900,7 @@ async def process_document(doc: Document, action: Action, background_tasks: Back
     return {
         "hipaa_compliant": risk == "low",
         "violations": violations,
+        "findings": {"counts": findings["counts"], "hits": findings["hits"]},
         "audit_log": {
             "doc_id": entry.doc_id,
             "action": entry.action,
@@ -970,6 +3909,7 @@ async def process_document(doc: Document, action: Action, background_tasks: Back
             "fingerprint": entry.fingerprint
         },
         "blockchain_hash": blockchain_entry.hash,
+        **ledger_receipt(blockchain_entry),
         "risk": risk
     }
 
@@ -983,6 +3923,14 @@ async def classify_text_endpoint(payload: dict):
     result = classify_document(text)
     return result
 
+@app.post("/classify/batch")
+async def classify_batch_endpoint(payload: dict):
+    """
+    payload = { "texts": ["...", "..."] }
+    """
+    texts = payload.get("texts", [])
+    return {"results": classify_batch(texts)}
+
 @app.post("/classify/file")
 async def classify_file_endpoint(file: UploadFile = File(...)):
     """
@@ -991,27 +3939,24 @@ async def classify_file_endpoint(file: UploadFile = File(...)):
     (PDF/text layer -> OCR, Word, CSV/Excel, DICOM metadata, images).
     """
     suffix = os.path.splitext(file.filename)[-1].lower()
-    content = await file.read()
+    # PDFs are spooled and streamed page by page instead of read into memory
+    content = await file.read() if suffix != ".pdf" else None
 
     extracted_text = ""
 
     try:
         if suffix == ".pdf":
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                for p in pdf.pages:
-                    t = p.extract_text() or ""
+            path, _ = await spool_upload(file, suffix)
+            try:
+                async for _, t, _ in iter_pdf_pages(path):
                     extracted_text += t + "\n"
-            if not extracted_text.strip():
-                # OCR fallback
-                with pdfplumber.open(io.BytesIO(content)) as pdf:
-                    for p in pdf.pages:
-                        img = p.to_image(resolution=300).original
-                        extracted_text += pytesseract.image_to_string(img) + "\n"
+            finally:
+                os.remove(path)
 
         elif suffix in [".jpg", ".jpeg", ".png", ".tiff"]:
             np_img = np.frombuffer(content, np.uint8)
             img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
-            extracted_text = pytesseract.image_to_string(img)
+            extracted_text = await ocr_executor.submit(_ocr_image_to_string, img)
 
         elif suffix in [".docx", ".doc"]:
             doc = Document(io.BytesIO(content))
@@ -1059,34 +4004,277 @@ async def classify_file_endpoint(file: UploadFile = File(...)):
     return result
 
 # ---------- Blockchain Viewing Endpoints ----------
-@app.get("/blockchain", summary="Get full blockchain")
-async def get_blockchain():
+def _ledger_filters(doc_id: str, user: str, since: datetime, until: datetime) -> Dict:
+    # Block timestamps are stored as UTC ISO strings, so they compare lexically
+    def iso(value):
+        if value is None:
+            return None
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).astimezone(timezone.utc).isoformat()
+    return {"doc_id": doc_id, "user": user, "since": iso(since), "until": iso(until)}
+
+def _ledger_cursor(cursor: str) -> Tuple[int, int]:
+    # "<block index>" or "<block index>:<position in batch>"
+    try:
+        index, _, position = cursor.partition(":")
+        return int(index), int(position) if position else -1
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor}")
+
+@app.get("/blockchain", summary="Get blockchain entries")
+async def get_blockchain(
+    cursor: str = Query(None, description="Only return entries after this one (next_cursor of the last page)"),
+    limit: int = Query(LEDGER_PAGE_SIZE, ge=1, le=LEDGER_MAX_PAGE_SIZE),
+    doc_id: str = Query(None),
+    user: str = Query(None),
+    since: datetime = Query(None, description="Blocks at or after this time"),
+    until: datetime = Query(None, description="Blocks before this time")
+):
     """
-    Returns the current blockchain entries for transparency.
+    Returns blockchain entries for transparency, one page at a time, oldest first.
     Each entry includes doc_id, action, user, violations, timestamp, and hash.
+    Entries are blocks (type "block") and, in batched ledger mode, the audit events
+    anchored by each Merkle batch block (type "event", with their position in it), so
+    filters find batched events too. Pass next_cursor back as cursor to fetch the
+    following page; it is null on the last page.
     """
-    return {"chain": blockchain}
+    after = (-1, -1) if cursor is None else _ledger_cursor(cursor)
+    # Ledger reads share the writer lock, so they run off the loop like appends and verify
+    entries = await asyncio.to_thread(blockchain.entries, after, limit, **_ledger_filters(doc_id, user, since, until))
+    next_cursor = None
+    if len(entries) == limit:
+        index, position = ledger_entry_key(entries[-1])
+        next_cursor = str(index) if position < 0 else f"{index}:{position}"
+    return {"chain": entries, "next_cursor": next_cursor}
+
+@app.get("/blockchain/export", summary="Stream blockchain entries as NDJSON")
+async def export_blockchain(
+    doc_id: str = Query(None),
+    user: str = Query(None),
+    since: datetime = Query(None),
+    until: datetime = Query(None)
+):
+    """Every matching block and batched event, one JSON object per line, written page by page as it is read."""
+    filters = _ledger_filters(doc_id, user, since, until)
+
+    async def stream():
+        after = (-1, -1)
+        while page := await asyncio.to_thread(blockchain.entries, after, LEDGER_MAX_PAGE_SIZE, **filters):
+            yield "".join(json.dumps(entry) + "\n" for entry in page)
+            after = ledger_entry_key(page[-1])
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="blockchain.ndjson"'}
+    )
 
 # ---------- Verify Blockchain Integrity ----------
 @app.get("/blockchain/verify")
-async def verify_blockchain():
+async def verify_blockchain(full: bool = Query(False, description="Rehash from genesis instead of the last verified block")):
     """
     Verifies the blockchain integrity.
-    Returns true if the chain is valid (no tampering).
+    Returns true if the chain is valid (no tampering). Only blocks appended since the
+    last successful verification are rehashed unless full=true.
     """
-    for i in range(1, len(blockchain)):
-        current = blockchain[i]
-        prev = blockchain[i - 1]
+    result = await asyncio.to_thread(blockchain.verify, full)
+    if result["valid"]:
+        result["message"] = "Blockchain integrity verified"
+    return result
 
-        # 1. Check hash integrity
-        if current.hash != current.compute_hash():
-            return {"valid": False, "error": f"Invalid hash at block {i}"}
+# ---------- Block Inclusion Proof ----------
+@app.get("/blockchain/proof/{index}")
+async def get_block_proof(index: int):
+    """
+    Merkle inclusion proof for one block against its sealed checkpoint root.
+    Blocks in the still-open range return checkpoint=None and the index that seals them.
+    """
+    proof = await asyncio.to_thread(blockchain.proof, index)
+    if proof is None:
+        raise HTTPException(status_code=404, detail=f"Block {index} not found")
+    return proof
+
+# ---------- Batched Event Inclusion Proof ----------
+@app.get("/blockchain/events/{event_hash}/proof")
+async def get_event_proof(event_hash: str):
+    """
+    Merkle inclusion proof for a batched audit event against the root stored in its
+    block. Prove the block itself with /blockchain/proof/{index}.
+    """
+    proof = await asyncio.to_thread(blockchain.event_proof, event_hash)
+    if proof is not None:
+        return proof
+    if ledger_batcher.find(event_hash) is not None:
+        return {"event": {"hash": event_hash}, "status": "pending", "retry_after": ledger_batcher.window}
+    raise HTTPException(status_code=404, detail=f"Event {event_hash} not found")
+
+@app.get("/blockchain/stats")
+async def get_blockchain_stats():
+    return dict(await asyncio.to_thread(blockchain.stats), batching=ledger_batcher.stats())
+
+# ---------- Result Cache Stats ----------
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return result_cache.stats()
+
+# ---------- Audit Log Query ----------
+AUDIT_PAGE_SIZE = int(os.getenv("AUDIT_PAGE_SIZE", "500"))
+AUDIT_MAX_PAGE_SIZE = int(os.getenv("AUDIT_MAX_PAGE_SIZE", "5000"))
+AUDIT_FIELDS = ["id", "doc_id", "action", "user", "timestamp", "fingerprint"]
+AUDIT_GROUPS = {
+    "action": AuditLog.action,
+    "user": AuditLog.user,
+    "doc_id": AuditLog.doc_id,
+    "day": func.date(AuditLog.timestamp),
+}
 
-        # 2. Check chain linkage
-        if current.previous_hash != prev.hash:
-            return {"valid": False, "error": f"Broken chain link at block {i}"}
+def _audit_time(value: datetime):
+    # Timestamps are stored as naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _audit_filtered(query, doc_id: str, user: str, action: str, since: datetime, until: datetime):
+    for column, value in [(AuditLog.doc_id, doc_id), (AuditLog.user, user), (AuditLog.action, action)]:
+        if value is not None:
+            query = query.filter(column == value)
+    if since is not None:
+        query = query.filter(AuditLog.timestamp >= _audit_time(since))
+    if until is not None:
+        query = query.filter(AuditLog.timestamp < _audit_time(until))
+    return query
+
+def _audit_cursor(entry: AuditLog) -> str:
+    return f"{entry.timestamp.isoformat()}|{entry.id}"
+
+def _audit_page(db, filters: Dict, cursor: str, limit: int) -> List[AuditLog]:
+    """One keyset page ordered by (timestamp, id); cursor is the last row of the previous page."""
+    query = _audit_filtered(db.query(AuditLog), **filters)
+    if cursor:
+        try:
+            timestamp, entry_id = cursor.rsplit("|", 1)
+            position = (datetime.fromisoformat(timestamp), int(entry_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor}")
+        query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) > position)
+    return query.order_by(AuditLog.timestamp, AuditLog.id).limit(limit).all()
+
+def _audit_row(entry: AuditLog) -> Dict:
+    return {field: getattr(entry, field) for field in AUDIT_FIELDS}
+
+@app.get("/audit/logs")
+async def get_audit_logs(
+    cursor: str = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(AUDIT_PAGE_SIZE, ge=1, le=AUDIT_MAX_PAGE_SIZE),
+    doc_id: str = Query(None),
+    user: str = Query(None),
+    action: str = Query(None),
+    since: datetime = Query(None, description="Entries at or after this time"),
+    until: datetime = Query(None, description="Entries before this time")
+):
+    """
+    Audit log entries oldest first, one page at a time. next_cursor is null on the
+    last page. Entries are group-committed, so the newest may appear a few ms late.
+    """
+    filters = {"doc_id": doc_id, "user": user, "action": action, "since": since, "until": until}
+    db = SessionLocal()
+    try:
+        entries = _audit_page(db, filters, cursor, limit)
+    finally:
+        db.close()
+    return {
+        "logs": [_audit_row(entry) for entry in entries],
+        "next_cursor": _audit_cursor(entries[-1]) if len(entries) == limit else None
+    }
+
+@app.get("/audit/logs/aggregate")
+async def aggregate_audit_logs(
+    group_by: List[str] = Query(["action"], description=f"Any of {list(AUDIT_GROUPS)}"),
+    doc_id: str = Query(None),
+    user: str = Query(None),
+    action: str = Query(None),
+    since: datetime = Query(None),
+    until: datetime = Query(None)
+):
+    """Entry counts per combination of the group_by columns (e.g. ?group_by=user&group_by=day)."""
+    unknown = set(group_by) - set(AUDIT_GROUPS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by {sorted(unknown)}, expected any of {list(AUDIT_GROUPS)}")
+    columns = [AUDIT_GROUPS[name].label(name) for name in group_by]
+    db = SessionLocal()
+    try:
+        query = _audit_filtered(db.query(*columns, func.count().label("count")), doc_id, user, action, since, until)
+        rows = query.group_by(*columns).order_by(*columns).all()
+    finally:
+        db.close()
+    return {"group_by": group_by, "groups": [dict(row._mapping) for row in rows], "total": sum(row.count for row in rows)}
+
+@app.get("/audit/logs/export")
+async def export_audit_logs(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    doc_id: str = Query(None),
+    user: str = Query(None),
+    action: str = Query(None),
+    since: datetime = Query(None),
+    until: datetime = Query(None)
+):
+    """Every matching entry as NDJSON or CSV, written page by page as it is read."""
+    filters = {"doc_id": doc_id, "user": user, "action": action, "since": since, "until": until}
+
+    def csv_line(values) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()
+
+    async def stream():
+        if format == "csv":
+            yield csv_line(AUDIT_FIELDS)
+        cursor = None
+        while True:
+            db = SessionLocal()
+            try:
+                entries = _audit_page(db, filters, cursor, AUDIT_MAX_PAGE_SIZE)
+            finally:
+                db.close()
+            if not entries:
+                return
+            rows = [_audit_row(entry) for entry in entries]
+            if format == "csv":
+                yield "".join(csv_line([row[field] for field in AUDIT_FIELDS]) for row in rows)
+            else:
+                yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+            if len(entries) < AUDIT_MAX_PAGE_SIZE:
+                return
+            cursor = _audit_cursor(entries[-1])
+            await asyncio.sleep(0)   # let other requests run between pages
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="audit_logs.{format}"'}
+    )
 
-    return {"valid": True, "message": "Blockchain integrity verified"}
+# ---------- Audit Writer Stats ----------
+@app.get("/audit/stats")
+async def get_audit_stats():
+    return audit_writer.stats()
+
+# ---------- Redaction Batcher Stats ----------
+@app.get("/redaction/stats")
+async def get_redaction_stats():
+    return redaction_batcher.stats()
+
+# ---------- OCR Worker Stats ----------
+@app.get("/ocr/stats")
+async def get_ocr_stats():
+    return dict(ocr_executor.stats(), page_cache=ocr_page_cache.stats())
+
+@app.on_event("shutdown")
+def shutdown_ocr_executor():
+    upload_scheduler.shutdown()
+    ocr_executor.shutdown()
+    ledger_batcher.flush()
+    audit_writer.shutdown()
 
 # ---------- Download Redacted File ----------
 @app.get("/download/{filename}")